@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 import environ
 
@@ -71,6 +72,76 @@ DATABASES = {
     }
 }
 
+# ----------------------------------
+# CACHE
+# ----------------------------------
+# Redis in production (set REDIS_URL), per-process locmem otherwise.
+REDIS_URL = env("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "ecommerce",
+        }
+    }
+
+# Seconds a cached catalog page lives; writes invalidate it sooner.
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=300)
+
+# Cached detail of Delivered/Cancelled orders (seconds)
+ORDER_SNAPSHOT_TIMEOUT = env.int("ORDER_SNAPSHOT_TIMEOUT", default=7 * 86400)
+
+# How long add-to-cart holds stock (seconds); swept by release_expired_reservations
+CART_RESERVATION_TTL = env.int("CART_RESERVATION_TTL", default=900)
+
+# Background jobs (manage.py run_workers). JOBS_EAGER runs them inline instead.
+JOBS_EAGER = env.bool("JOBS_EAGER", default=False)
+JOBS_LOCK_TIMEOUT = env.int("JOBS_LOCK_TIMEOUT", default=600)
+
+# Seconds before outbox mail a sender died on is queued again (sent by the job workers)
+OUTBOX_LOCK_TIMEOUT = env.int("OUTBOX_LOCK_TIMEOUT", default=300)
+
+# Cached unread-notification counts are recounted at least this often (seconds)
+NOTIFICATION_UNREAD_TIMEOUT = env.int("NOTIFICATION_UNREAD_TIMEOUT", default=3600)
+
+# Cold storage for `manage.py archive_orders` segments
+ORDER_ARCHIVE_DIR = env.str("ORDER_ARCHIVE_DIR", default=str(BASE_DIR / "archive"))
+
+# User lookups by email/id (users.py): shared cache tier, and per-process copies (seconds)
+USER_CACHE_TIMEOUT = env.int("USER_CACHE_TIMEOUT", default=300)
+USER_CACHE_LOCAL_TTL = env.int("USER_CACHE_LOCAL_TTL", default=30)
+
+# Password-reset OTPs (otp_store.py). The cache store needs a cache shared by every
+# process, so it is the default only with Redis; otherwise OTPs stay in the table.
+OTP_STORE = env.str(
+    "OTP_STORE",
+    default="ecommerce_app.otp_store.CacheOTPStore" if REDIS_URL else "ecommerce_app.otp_store.ModelOTPStore",
+)
+OTP_TTL = env.int("OTP_TTL", default=900)
+OTP_MAX_ATTEMPTS = env.int("OTP_MAX_ATTEMPTS", default=5)
+
+# Login / OTP throttling (ratelimit.py): {scope: {"ip" or request field: "count/window"}}
+RATE_LIMIT_ENABLED = env.bool("RATE_LIMIT_ENABLED", default=True)
+RATE_LIMITS = {
+    "login": {"ip": "20/m", "username": "10/m"},
+    "forget_password": {"ip": "10/m", "email": "3/15m"},
+    "verify_otp": {"ip": "20/m", "email": "5/15m"},
+}
+# META key holding the client address when behind a proxy, e.g. "HTTP_X_FORWARDED_FOR"
+RATE_LIMIT_IP_HEADER = env.str("RATE_LIMIT_IP_HEADER", default="") or None
+
+# Idempotency-Key replays (seconds)
+IDEMPOTENCY_TTL = env.int("IDEMPOTENCY_TTL", default=86400)
+IDEMPOTENCY_WAIT_TIMEOUT = env.int("IDEMPOTENCY_WAIT_TIMEOUT", default=5)
+IDEMPOTENCY_LOCK_TIMEOUT = env.int("IDEMPOTENCY_LOCK_TIMEOUT", default=60)
+
 # ----------------------------------
 # PASSWORD VALIDATION
 # ----------------------------------
@@ -131,6 +202,16 @@ REST_FRAMEWORK = {
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
+    # Signed JWTs; request.user is built from the token's claims, no DB hit
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication",
+    ],
+}
+
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=env.int("JWT_ACCESS_MINUTES", default=30)),
+    "REFRESH_TOKEN_LIFETIME": timedelta(days=env.int("JWT_REFRESH_DAYS", default=7)),
+    "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
 # ----------------------------------
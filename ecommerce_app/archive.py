@@ -0,0 +1,168 @@
+import contextvars
+import gzip
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import exports, orders
+from .models import ArchivedOrder, Notification, Order, OrderItem
+from .projection import ORDER_DETAIL
+
+
+CHUNK_SIZE = 500
+
+# Set while archived orders are deleted from the hot tables, so delete
+# signals (sales rollup) know the order still counts.
+in_progress = contextvars.ContextVar("archive_in_progress", default=False)
+
+
+def archive_dir():
+    return Path(getattr(settings, "ORDER_ARCHIVE_DIR", settings.BASE_DIR / "archive"))
+
+
+def _append_member(relative_path, records):
+    """
+    Append ``records`` as one gzip member (concatenated members are still
+    one valid .gz file) and return (offset, length) of the member.
+    """
+    path = archive_dir() / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = b"".join(json.dumps(r, cls=DjangoJSONEncoder).encode() + b"\n" for r in records)
+    blob = gzip.compress(lines)
+    with open(path, "ab") as f:
+        offset = f.tell()
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())  # on disk before the rows it replaces are deleted
+    return offset, len(blob)
+
+
+def _segment(kind, month, run):
+    return f"{month:%Y}/{month:%m}/{kind}-{month:%Y-%m}-{run}.jsonl.gz"
+
+
+def archive_orders(cutoff, chunk_size=CHUNK_SIZE, statuses=orders.FINAL_STATUSES):
+    """
+    Move finished orders created before ``cutoff`` (detail document with
+    items and the shipping address as it was) into month-sharded,
+    gzip-compressed JSONL segments, then delete them from the hot tables
+    one chunk per transaction. Each chunk is written to disk before its
+    rows are deleted, so a crash can leave an unindexed copy behind but
+    never lose an order. Returns the number archived.
+    """
+    run = timezone.now().strftime("%Y%m%dT%H%M%S")
+    archived = 0
+    while True:
+        ids = list(
+            Order.objects.filter(status__in=statuses, created_at__lt=cutoff)
+            .order_by("id").values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return archived
+
+        # the exact accounting export rows go along, so export_orders still covers these orders
+        lines = defaultdict(list)
+        for values in exports.order_lines(ids):
+            lines[values[0]].append(values)
+        shards = defaultdict(list)
+        for document, row in orders.load_orders(Order.objects.filter(pk__in=ids), extra=("user_id", "created_at")):
+            record = {**document, "user_id": row["user_id"], "updated_at": row["updated_at"], "lines": lines[row["id"]]}
+            shards[timezone.localdate(row["created_at"]).replace(day=1)].append((record, row))
+
+        index = []
+        for month, entries in shards.items():
+            segment = _segment("orders", month, run)
+            offset, length = _append_member(segment, [record for record, _ in entries])
+            index += [
+                ArchivedOrder(
+                    order_id=row["id"], user_id=row["user_id"], status=row["status"],
+                    created_at=row["created_at"], segment=segment, offset=offset, length=length,
+                )
+                for _, row in entries
+            ]
+
+        token = in_progress.set(True)
+        try:
+            with transaction.atomic():
+                ArchivedOrder.objects.bulk_create(index)
+                OrderItem.objects.filter(order_id__in=ids).delete()
+                Order.objects.filter(pk__in=ids).delete()
+        finally:
+            in_progress.reset(token)
+        archived += len(ids)
+
+
+def archive_notifications(cutoff, chunk_size=CHUNK_SIZE):
+    """Move read notifications older than ``cutoff`` into segments; nothing reads them back."""
+    run = timezone.now().strftime("%Y%m%dT%H%M%S")
+    archived = 0
+    while True:
+        rows = list(
+            Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+            .order_by("id").values("id", "user_id", "message", "created_at")[:chunk_size]
+        )
+        if not rows:
+            return archived
+        months = defaultdict(list)
+        for row in rows:
+            months[timezone.localdate(row["created_at"]).replace(day=1)].append(row)
+        for month, records in months.items():
+            _append_member(_segment("notifications", month, run), records)
+        Notification.objects.filter(pk__in=[r["id"] for r in rows]).delete()
+        archived += len(rows)
+
+
+def _read_member(segment, offset, length):
+    with open(archive_dir() / segment, "rb") as f:
+        f.seek(offset)
+        blob = f.read(length)
+    return [json.loads(line) for line in gzip.decompress(blob).splitlines()]
+
+
+def read_order(pk):
+    """An archived order's detail document (with user_id, updated_at), or None."""
+    entry = ArchivedOrder.objects.filter(pk=pk).first()
+    if entry is None:
+        return None
+    for record in _read_member(entry.segment, entry.offset, entry.length):
+        if record["order_id"] == entry.order_id:
+            return record
+    return None
+
+
+def snapshot_order(pk):
+    """
+    Put an archived order back in the snapshot cache; returns the cached
+    snapshot, or None if ``pk`` isn't archived. Archived orders are final,
+    so the snapshot stays valid from then on.
+    """
+    record = read_order(pk)
+    if record is None:
+        return None
+    document = {name: record[name] for name in ORDER_DETAIL.presets["full"]}
+    return orders.cache_snapshot(pk, document, parse_datetime(record["updated_at"]))
+
+
+def entries_in(date_from, date_to):
+    return ArchivedOrder.objects.filter(created_at__gte=date_from, created_at__lt=date_to)
+
+
+def iter_records(entries):
+    """Archived records for ``entries`` in order_id order, each gzip member read once."""
+    members = {}
+    for entry in entries.order_by("order_id").iterator():
+        key = (entry.segment, entry.offset, entry.length)
+        if key not in members:
+            if len(members) > 8:  # one chunk's orders share a member; keep the last few decoded
+                members.pop(next(iter(members)))
+            members[key] = {r["order_id"]: r for r in _read_member(*key)}
+        record = members[key].get(entry.order_id)
+        if record is not None:
+            yield record
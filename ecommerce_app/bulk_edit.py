@@ -0,0 +1,127 @@
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import catalog_cache, facets
+from .catalog import MAX_PRICE, parse_bool
+from .models import Product
+
+
+MAX_UPDATES = 10000
+BATCH_SIZE = 500
+
+OK = "ok"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+DUPLICATE = "duplicate"
+INSUFFICIENT_STOCK = "insufficient_stock"
+
+
+def _clean(item):
+    """Return (pk, changes) for one delta, raising ValueError if it's malformed."""
+    pk = int(item["id"])
+    changes = {}
+    if "price" in item:
+        price = Decimal(str(item["price"]))
+        if not price.is_finite() or not 0 <= price < MAX_PRICE:
+            raise ValueError
+        changes["price"] = price
+    if "stock" in item and "stock_delta" in item:
+        raise ValueError  # absolute and relative stock in one delta is ambiguous
+    if "stock" in item:
+        stock = int(item["stock"])
+        if stock < 0:
+            raise ValueError
+        changes["stock"] = stock
+    if "stock_delta" in item:
+        changes["stock_delta"] = int(item["stock_delta"])
+    if "is_active" in item:
+        is_active = parse_bool(item["is_active"])
+        if is_active is None:
+            raise ValueError
+        changes["is_active"] = is_active
+    if not changes:
+        raise ValueError
+    return pk, changes
+
+
+def _id(item):
+    # an invalid delta still claims its id, so a later one for it is a duplicate
+    try:
+        return int(item["id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def apply_product_updates(items):
+    """
+    Apply many {id, price?, stock?, stock_delta?, is_active?} deltas in one
+    transaction. Rows are locked with a single SELECT ... FOR UPDATE,
+    then written with bulk_update (one CASE-based UPDATE per batch and
+    field set). Relative stock changes are F("stock") + delta, and one
+    that would take stock below zero is refused for that id only.
+    Returns {id: status}.
+    """
+    results, cleaned, seen = {}, {}, set()
+    for item in items:
+        try:
+            pk, changes = _clean(item)
+        except (KeyError, TypeError, ValueError, InvalidOperation, AttributeError):
+            pk, changes = _id(item), None
+            if pk is None:
+                results[str(item.get("id") if isinstance(item, dict) else None)] = INVALID
+                continue
+        if pk in seen:
+            # which of two deltas for one id should win is the caller's call
+            results[str(pk)] = DUPLICATE
+            cleaned.pop(pk, None)
+            continue
+        seen.add(pk)
+        if changes is None:
+            results[str(pk)] = INVALID
+        else:
+            cleaned[pk] = changes
+
+    if not cleaned:
+        return results
+
+    now = timezone.now()
+    with transaction.atomic():
+        current = {
+            row[0]: dict(zip(facets.FACET_FIELDS, row[1:]))
+            for row in Product.objects.select_for_update()
+            .filter(pk__in=list(cleaned))
+            .values_list("id", *facets.FACET_FIELDS)
+        }
+        groups, facet_deltas = {}, Counter()
+        for pk, changes in cleaned.items():
+            if pk not in current:
+                results[str(pk)] = NOT_FOUND
+                continue
+            before = current[pk]
+            after = {**before, **changes}
+            delta = changes.pop("stock_delta", None)
+            if delta is not None:
+                after["stock"] = before["stock"] + delta
+                if after["stock"] < 0:
+                    results[str(pk)] = INSUFFICIENT_STOCK
+                    continue
+                changes["stock"] = F("stock") + delta
+            facet_deltas[facets.facet_key(*before.values())] -= 1
+            facet_deltas[facets.facet_key(*(after[f] for f in facets.FACET_FIELDS))] += 1
+            product = Product(pk=pk, updated_at=now, **changes)
+            groups.setdefault(tuple(sorted(changes)), []).append(product)
+            results[str(pk)] = OK
+
+        updated = []
+        for fields, products in groups.items():
+            Product.objects.bulk_update(products, [*fields, "updated_at"], batch_size=BATCH_SIZE)
+            updated += [p.pk for p in products]
+        facets.apply_deltas(facet_deltas)
+
+        if updated:
+            transaction.on_commit(lambda: catalog_cache.invalidate_product(*updated))
+    return results
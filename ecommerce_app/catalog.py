@@ -0,0 +1,124 @@
+from decimal import Decimal, InvalidOperation
+
+from .models import Product
+from .projection import PRODUCTS
+
+
+TRUE_VALUES = ("1", "true", "yes")
+FALSE_VALUES = ("0", "false", "no")
+_price_field = Product._meta.get_field("price")
+MAX_PRICE = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places)
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+class InvalidProduct(ValueError):
+    pass
+
+
+def parse_bool(value):
+    if value is None or value == "":
+        return None
+    value = str(value).lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise InvalidFilter(value)
+
+
+def parse_price(value):
+    if value is None or value == "":
+        return None
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        raise InvalidFilter(value)
+    if not price.is_finite() or price < 0:
+        raise InvalidFilter(value)
+    return price
+
+
+def filter_products(params, queryset=None):
+    """
+    Apply the storefront filters (category, min_price, max_price, in_stock,
+    is_active) from a query dict. Raises InvalidFilter on bad input.
+    """
+    qs = Product.objects.all() if queryset is None else queryset
+
+    category = params.get("category")
+    if category:
+        qs = qs.filter(category=category)
+
+    min_price = parse_price(params.get("min_price"))
+    if min_price is not None:
+        qs = qs.filter(price__gte=min_price)
+    max_price = parse_price(params.get("max_price"))
+    if max_price is not None:
+        qs = qs.filter(price__lte=max_price)
+
+    in_stock = parse_bool(params.get("in_stock"))
+    if in_stock is True:
+        qs = qs.filter(stock__gt=0)
+    elif in_stock is False:
+        qs = qs.filter(stock=0)
+
+    is_active = parse_bool(params.get("is_active"))
+    if is_active is not None:
+        qs = qs.filter(is_active=is_active)
+
+    return qs
+
+
+def _text(data, field):
+    # JSON feeds send numbers for things like sku or category: take them as
+    # text, but don't stringify objects, lists or booleans into the catalog
+    value = data.get(field)
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float, Decimal)):
+        raise InvalidProduct(f"{field} must be text.")
+    return str(value)
+
+
+def clean_product_data(data):
+    """
+    Validate and coerce the writable product fields the way AddProductView
+    always has (required name/price, Decimal price, int stock). Shared by
+    the single-product view and the bulk importer. Raises InvalidProduct.
+    """
+    name = _text(data, "name")
+    price = data.get("price")
+    if not all([name, price]):
+        raise InvalidProduct("name and price are required.")
+
+    stock = data.get("stock")
+    try:
+        price = Decimal(str(price))
+        stock = int(stock) if stock not in (None, "") else 0
+        if not price.is_finite() or not 0 <= price < MAX_PRICE or stock < 0:
+            raise ValueError
+    except (InvalidOperation, ValueError, TypeError):
+        raise InvalidProduct("Invalid price or stock.")
+
+    cleaned = {
+        "name": name,
+        "price": price,
+        "description": _text(data, "description"),
+        "category": _text(data, "category"),
+        "stock": stock,
+        "image": _text(data, "image"),
+        "sku": _text(data, "sku") or None,
+    }
+    for field in ("name", "category", "sku"):
+        max_length = Product._meta.get_field(field).max_length
+        if cleaned[field] and len(cleaned[field]) > max_length:
+            raise InvalidProduct(f"{field} is longer than {max_length} characters.")
+    return cleaned
+
+
+def product_to_dict(p, fields=None):
+    """Public representation of a product (model instance or .values() row)."""
+    return PRODUCTS.render(p, fields or PRODUCTS.presets["full"])
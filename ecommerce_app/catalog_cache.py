@@ -0,0 +1,102 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import product_to_dict
+from .models import Product
+
+
+VERSION_KEY = "catalog:version"
+LOCK_TIMEOUT = 10       # seconds a recompute may hold the lock
+WAIT_TIMEOUT = 5        # seconds a waiter polls before computing itself
+WAIT_INTERVAL = 0.05
+
+
+def _timeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 300)
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """
+    Invalidate every cached catalog page at once. Old entries are never
+    read again and simply age out.
+    """
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        return cache.incr(VERSION_KEY)
+
+
+def get_or_compute(key, compute, timeout=None):
+    """
+    Read-through cache with single-flight recompute: on a miss only the
+    worker that wins the lock runs ``compute``; the others poll for its
+    result instead of all hitting the database together.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout=_timeout() if timeout is None else timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break  # holder died or failed; fall through and compute
+    return compute()
+
+
+def page_key(namespace, params):
+    # Normalise the query string so ?a=1&b=2 and ?b=2&a=1 share an entry.
+    items = sorted((k, v) for k in params for v in params.getlist(k))
+    digest = hashlib.md5(urlencode(items).encode()).hexdigest()
+    return f"catalog:v{get_version()}:{namespace}:{digest}"
+
+
+def product_key(pk):
+    return f"catalog:product:{pk}"
+
+
+def get_product_payload(pk):
+    """
+    Serialized product by id, or None if it doesn't exist. Per-product
+    entries are dropped individually by invalidate_product.
+    """
+    def compute():
+        product = Product.objects.filter(pk=pk).first()
+        # cache misses too, as False, so bad ids don't hammer the DB
+        return product_to_dict(product) if product else False
+
+    return get_or_compute(product_key(pk), compute) or None
+
+
+def drop_products(*pks):
+    cache.delete_many([product_key(pk) for pk in pks])
+
+
+def invalidate_product(*pks):
+    drop_products(*pks)
+    bump_version()
@@ -0,0 +1,117 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import catalog_cache, facets, reservations, sales
+from .models import Cart, Order, OrderItem, Product, Reservation
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_name):
+        super().__init__(product_name)
+        self.product_name = product_name
+
+
+def _per_product(quantities):
+    # CASE id WHEN 1 THEN 2 WHEN 7 THEN 1 ... END
+    return Case(
+        *(When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()),
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def place_order(user, cart_items, shipping_address=None):
+    """
+    Turn ``cart_items`` (Cart rows with their product selected) into an
+    Order for ``user`` (a User or the request's token user; only its pk
+    is used) in one transaction, with the same handful of queries whatever
+    the cart size:
+
+    - stock for every line is taken with a single conditional
+      UPDATE ... SET stock = stock - qty WHERE stock - reserved + held >= qty,
+      which also turns the user's own cart reservations (held) into the
+      sale; if it touches fewer rows than there are lines, someone else
+      got there first and the whole order rolls back (InsufficientStock);
+    - order items go in with one bulk_create (subtotal set here, since
+      bulk_create skips OrderItem.save()).
+    """
+    quantities = Counter()
+    prices = {}
+    categories = {}
+    for ci in cart_items:
+        quantities[ci.product_id] += ci.quantity
+        prices[ci.product_id] = ci.product.price
+        categories[ci.product_id] = ci.product.category
+    total = sum((prices[pk] * qty for pk, qty in quantities.items()), Decimal("0.00"))
+
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                user_id=user.pk, total_amount=total, status="Pending", shipping_address=shipping_address
+            )
+            holds = dict(
+                Reservation.objects.select_for_update().filter(user_id=user.pk)
+                .values_list("product_id", "quantity")
+            )
+            held = {pk: holds.pop(pk) for pk in list(holds) if pk in quantities}
+            taken = Product.objects.filter(
+                pk__in=list(quantities),
+                stock__gte=F("reserved") - _per_product(held) + _per_product(quantities),
+            ).update(
+                stock=F("stock") - _per_product(quantities),
+                reserved=F("reserved") - _per_product(held),
+                updated_at=timezone.now(),
+            )
+            if taken != len(quantities):
+                raise InsufficientStock(None)
+            reservations.unreserve(holds)  # holds on products no longer in the cart
+            Reservation.objects.filter(user_id=user.pk).delete()
+
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order, product_id=pk, quantity=qty, price_at_purchase=prices[pk],
+                    subtotal=prices[pk] * qty,
+                )
+                for pk, qty in quantities.items()
+            ])
+            Cart.objects.filter(user_id=user.pk).delete()
+
+            lines = {}
+            for pk, qty in quantities.items():
+                units, revenue = lines.get(categories[pk] or "", (0, Decimal("0.00")))
+                lines[categories[pk] or ""] = (units + qty, revenue + prices[pk] * qty)
+            sales.record_order(order, lines)
+
+            # the UPDATE bypassed Product signals: move sold-out products
+            # to the out-of-stock facet ourselves
+            sold_out = list(
+                Product.objects.filter(pk__in=list(quantities), stock=0)
+                .values_list(*facets.FACET_FIELDS)
+            )
+            if sold_out:
+                deltas = Counter()
+                for category, price, stock, is_active in sold_out:
+                    # it had stock >= qty >= 1 before this order
+                    deltas[facets.facet_key(category, price, 1, is_active)] -= 1
+                    deltas[facets.facet_key(category, price, stock, is_active)] += 1
+                facets.apply_deltas(deltas)
+    except InsufficientStock:
+        short = next(
+            (name for pk, stock, reserved, name in Product.objects.filter(pk__in=list(quantities))
+             .values_list("id", "stock", "reserved", "name") if stock - reserved + held.get(pk, 0) < quantities[pk]),
+            None,
+        )
+        raise InsufficientStock(short)
+
+    # Per-product payloads are always refreshed. Catalog pages only when
+    # availability flipped; until then listed stock counts may lag by up
+    # to CATALOG_CACHE_TIMEOUT, which keeps checkouts from flushing the
+    # whole catalog cache.
+    product_ids = list(quantities)
+    transaction.on_commit(lambda: catalog_cache.drop_products(*product_ids))
+    if sold_out:
+        transaction.on_commit(catalog_cache.bump_version)
+    return order
@@ -0,0 +1,51 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional(validator):
+    """
+    Wrap a view method so GET/HEAD requests are answered with 304 Not
+    Modified when the client's If-None-Match / If-Modified-Since still
+    matches. ``validator(request, *args, **kwargs)`` returns
+    ``(etag, last_modified)`` cheaply, before the real handler builds the
+    body; returning ``(None, None)`` skips the check (e.g. not found).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return method(view, request, *args, **kwargs)
+
+            etag, last_modified = validator(request, *args, **kwargs)
+            if etag is None and last_modified is None:
+                return method(view, request, *args, **kwargs)
+
+            etag = quote_etag(etag) if etag else None
+            timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if etag:
+                    response.headers.setdefault("ETag", etag)
+                if timestamp is not None:
+                    response.headers.setdefault("Last-Modified", http_date(timestamp))
+            return response
+        return wrapper
+    return decorator
+
+
+def queryset_validators(queryset, *extra):
+    """
+    ETag/Last-Modified for a whole result set from one aggregate query.
+    Count catches deletes, which MAX(updated_at) alone would miss.
+    """
+    agg = queryset.order_by().aggregate(last=Max("updated_at"), count=Count("id"))
+    last = agg["last"]
+    raw = ":".join(str(part) for part in (*extra, last.isoformat() if last else "", agg["count"]))
+    return hashlib.md5(raw.encode()).hexdigest(), last
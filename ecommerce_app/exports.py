@@ -0,0 +1,256 @@
+import csv
+import hashlib
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_datetime
+
+from .models import Order, OrderItem, Product
+
+
+CATALOG_FIELDS = (
+    "id", "sku", "name", "description", "price", "category", "stock", "image",
+    "is_active", "created_at", "updated_at",
+)
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+FORMATS = ("jsonl", "csv")
+CONTENT_TYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+
+class _Echo:
+    # csv.writer wants a file; hand the formatted line straight back instead
+    def write(self, value):
+        return value
+
+
+def iter_catalog_rows(chunk_size=CHUNK_SIZE):
+    # values_list + iterator: a server-side cursor on PostgreSQL, no model
+    # instances, and only chunk_size rows in memory at a time.
+    return (
+        Product.objects.order_by("id")
+        .values_list(*CATALOG_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def jsonl_lines(rows, fields=CATALOG_FIELDS):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + "\n"
+
+
+def csv_lines(rows, fields=CATALOG_FIELDS):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def encode_lines(lines, flush_bytes=FLUSH_BYTES):
+    """Join text lines into ~flush_bytes UTF-8 chunks for fewer, larger writes."""
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= flush_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_catalog(fmt="jsonl", gzip=False, chunk_size=CHUNK_SIZE):
+    """Byte chunks of the whole catalog in constant memory."""
+    if fmt not in FORMATS:
+        raise ValueError(fmt)
+    lines = (jsonl_lines if fmt == "jsonl" else csv_lines)(iter_catalog_rows(chunk_size))
+    chunks = encode_lines(lines)
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+# ── Order export (accounting) ─────────────────────────────────────────────
+# One row per order line. Shards are contiguous order-id ranges exported
+# by separate processes; output is a function of the data alone (fixed
+# shard bounds, rows in (order, item) order, gzip without a timestamp), so
+# re-running an export gives byte-identical files.
+
+ORDER_LINE_FIELDS = (
+    "order_id", "order_created_at", "status", "user_id", "order_total",
+    "item_id", "product_id", "product_name", "quantity", "price_at_purchase", "subtotal",
+    "ship_street", "ship_city", "ship_state", "ship_zip_code",
+)
+_ORDER_LINE_COLUMNS = (
+    "order_id", "order__created_at", "order__status", "order__user_id", "order__total_amount",
+    "id", "product_id", "product__name", "quantity", "price_at_purchase", "subtotal",
+    "order__shipping_address__street", "order__shipping_address__city",
+    "order__shipping_address__state", "order__shipping_address__zip_code",
+)
+_DECIMAL_FIELDS = {"order_total", "price_at_purchase", "subtotal"}
+_DATETIME_FIELDS = {"order_created_at"}
+
+
+def _orders_in(date_from, date_to):
+    return Order.objects.filter(created_at__gte=date_from, created_at__lt=date_to)
+
+
+def order_shards(date_from, date_to, shards):
+    """Split the id range of orders created in [date_from, date_to) into ``shards`` contiguous [lo, hi] ranges."""
+    bounds = _orders_in(date_from, date_to).aggregate(lo=Min("id"), hi=Max("id"))
+    if bounds["lo"] is None:
+        return []
+    lo, hi = bounds["lo"], bounds["hi"]
+    step = max(-(-(hi - lo + 1) // shards), 1)
+    return [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+
+
+def iter_order_lines(date_from, date_to, lo, hi, chunk_size=CHUNK_SIZE):
+    return (
+        OrderItem.objects.filter(
+            order__created_at__gte=date_from, order__created_at__lt=date_to,
+            order_id__gte=lo, order_id__lte=hi,
+        )
+        .order_by("order_id", "id")
+        .values_list(*_ORDER_LINE_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def order_lines(order_ids):
+    """Export rows for ``order_ids``, JSON-safe without losing precision, for the archive."""
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("order_id", "id")
+        .values_list(*_ORDER_LINE_COLUMNS)
+    )
+    return [
+        [
+            value if value is None else str(value) if name in _DECIMAL_FIELDS
+            else value.isoformat() if name in _DATETIME_FIELDS else value
+            for name, value in zip(ORDER_LINE_FIELDS, row)
+        ]
+        for row in rows
+    ]
+
+
+def archived_line(values):
+    """An archived order_lines() row back as the tuple a live export would have."""
+    return tuple(
+        value if value is None else Decimal(value) if name in _DECIMAL_FIELDS
+        else parse_datetime(value) if name in _DATETIME_FIELDS else value
+        for name, value in zip(ORDER_LINE_FIELDS, values)
+    )
+
+
+def _init_worker():
+    # fork()ed children inherit the parent's DB sockets: start clean
+    django.setup()
+    connections.close_all()
+
+
+def export_order_shard(task):
+    """Write one shard file; in a pool worker this uses that process's own connection."""
+    index, lo, hi, date_from, date_to, out_dir, fmt, gzip = task
+    name = f"part-{index:05d}.{fmt}" + (".gz" if gzip else "")
+    rows, sha256 = _write_part(os.path.join(out_dir, name), iter_order_lines(date_from, date_to, lo, hi), fmt, gzip)
+    return {"file": name, "min_order_id": lo, "max_order_id": hi, "rows": rows, "sha256": sha256}
+
+
+def _write_part(path, source, fmt, gzip):
+    """Write order-line rows to ``path``; returns (rows, sha256 of the file)."""
+    rows = 0
+
+    def counted(source):
+        nonlocal rows
+        for row in source:
+            rows += 1
+            yield row
+
+    lines = (jsonl_lines if fmt == "jsonl" else csv_lines)(counted(source), fields=ORDER_LINE_FIELDS)
+    chunks = encode_lines(lines)
+    digest = hashlib.sha256()
+    with open(path, "wb") as fh:
+        for chunk in gzip_chunks(chunks) if gzip else chunks:
+            digest.update(chunk)
+            fh.write(chunk)
+    return rows, digest.hexdigest()
+
+
+def export_archived(date_from, date_to, out_dir, fmt="csv", gzip=False):
+    """
+    Write the lines of orders archive_orders moved out of the hot tables
+    into ``archived.<fmt>``, or return None if none fall in the range.
+    Orders archived before their lines were kept can't be exported; they
+    are counted under "orders_without_lines" so the gap isn't silent.
+    """
+    from . import archive  # archive imports this module
+
+    entries = archive.entries_in(date_from, date_to)
+    if not entries.exists():
+        return None
+    skipped = []
+
+    def rows():
+        for record in archive.iter_records(entries):
+            if "lines" not in record:
+                skipped.append(record["order_id"])
+                continue
+            yield from (archived_line(values) for values in record["lines"])
+
+    name = f"archived.{fmt}" + (".gz" if gzip else "")
+    count, sha256 = _write_part(os.path.join(out_dir, name), rows(), fmt, gzip)
+    return {"file": name, "rows": count, "sha256": sha256,
+            "orders_without_lines": len(skipped), "order_ids_without_lines": skipped}
+
+
+def export_orders(date_from, date_to, out_dir, workers=4, shards=None, fmt="csv", gzip=False):
+    """
+    Export order lines for orders created in [date_from, date_to) into
+    ``out_dir`` as one file per shard plus manifest.json, using a pool of
+    ``workers`` processes; archived orders in the range go in one more
+    file. Returns the manifest.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(fmt)
+    os.makedirs(out_dir, exist_ok=True)
+    ranges = order_shards(date_from, date_to, shards or workers * 4)
+    tasks = [(i, lo, hi, date_from, date_to, out_dir, fmt, gzip) for i, (lo, hi) in enumerate(ranges)]
+
+    if workers > 1 and len(tasks) > 1:
+        connections.close_all()  # don't hand our socket to the children
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            parts = list(pool.map(export_order_shard, tasks))
+    else:
+        parts = [export_order_shard(task) for task in tasks]
+    archived = export_archived(date_from, date_to, out_dir, fmt, gzip)
+
+    manifest = {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "format": fmt,
+        "gzip": gzip,
+        "fields": ORDER_LINE_FIELDS,
+        "rows": sum(p["rows"] for p in parts) + (archived["rows"] if archived else 0),
+        "shards": parts,
+        "archived": archived,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
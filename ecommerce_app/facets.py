@@ -0,0 +1,178 @@
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Value, When
+
+from .catalog import filter_products, parse_bool, parse_price
+from .models import Product, ProductFacetCount
+
+
+# Lower bounds of the price bands; the last band is open-ended.
+PRICE_BANDS = [Decimal(b) for b in ("0", "500", "1000", "2500", "5000", "10000", "25000", "50000")]
+
+
+def price_band(price):
+    return max(bisect_right(PRICE_BANDS, Decimal(price)) - 1, 0)
+
+
+def facet_key(category, price, stock, is_active):
+    return (category or "", price_band(price), stock > 0, bool(is_active))
+
+
+FACET_FIELDS = ("category", "price", "stock", "is_active")
+
+
+def product_key(product):
+    values = [getattr(product, f) for f in FACET_FIELDS]
+    if any(hasattr(v, "resolve_expression") for v in values):
+        return stored_key(product.pk)  # e.g. stock=F("stock") - 1; read what was written
+    return facet_key(*values)
+
+
+def stored_key(pk):
+    row = Product.objects.filter(pk=pk).values_list(*FACET_FIELDS).first()
+    return facet_key(*row) if row else None
+
+
+def apply_deltas(deltas):
+    """
+    Add a Counter of {facet_key: +/-n} to the rollup table. Runs in the
+    caller's transaction so counts commit (or roll back) with the rows.
+    """
+    for (category, band, in_stock, is_active), delta in deltas.items():
+        if not delta:
+            continue
+        lookup = dict(category=category, price_band=band, in_stock=in_stock, is_active=is_active)
+        if ProductFacetCount.objects.filter(**lookup).update(count=F("count") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                ProductFacetCount.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # another writer created the row first
+            ProductFacetCount.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def record_change(before, after):
+    """Move one product between facet keys (either side may be None)."""
+    deltas = Counter()
+    if before is not None:
+        deltas[before] -= 1
+    if after is not None:
+        deltas[after] += 1
+    apply_deltas(deltas)
+
+
+def rebuild():
+    """Recompute the whole rollup from Product, e.g. after raw SQL edits."""
+    with transaction.atomic():
+        ProductFacetCount.objects.all().delete()
+        ProductFacetCount.objects.bulk_create(
+            ProductFacetCount(category=c, price_band=b, in_stock=s, is_active=a, count=n)
+            for c, b, s, a, n in _live_rows(Product.objects.all())
+        )
+
+
+def _band_expression():
+    whens = [When(price__lt=bound, then=Value(i - 1)) for i, bound in enumerate(PRICE_BANDS) if i]
+    return Case(*whens, default=Value(len(PRICE_BANDS) - 1), output_field=IntegerField())
+
+
+def _live_rows(queryset):
+    return (
+        queryset.order_by()
+        .annotate(
+            band=_band_expression(),
+            has_stock=Case(When(stock__gt=0, then=Value(True)), default=Value(False),
+                           output_field=BooleanField()),
+        )
+        .values_list("category", "band", "has_stock", "is_active")
+        .annotate(n=Count("id"))
+    )
+
+
+def _band_range(min_price, max_price):
+    """Band index range [lo, hi) when the price filter sits on band edges, else None."""
+    lo, hi = 0, len(PRICE_BANDS)
+    if min_price is not None:
+        if min_price not in PRICE_BANDS:
+            return None
+        lo = PRICE_BANDS.index(min_price)
+    if max_price is not None:
+        if max_price not in PRICE_BANDS:
+            return None
+        hi = PRICE_BANDS.index(max_price)
+    return lo, hi
+
+
+def compute_facets(params):
+    """
+    Category, price-band and availability counts for the filter set in
+    ``params`` (same names as filter_products). Each facet ignores its own
+    filter, so the UI can show the alternatives to the current choice.
+
+    Answered from the rollup table; price filters that don't line up
+    with band edges (or products priced exactly at max_price) fall back
+    to one grouped query over Product.
+    """
+    category = params.get("category") or None
+    in_stock = parse_bool(params.get("in_stock"))
+    is_active = parse_bool(params.get("is_active"))
+    min_price = parse_price(params.get("min_price"))
+    max_price = parse_price(params.get("max_price"))
+
+    bands = _band_range(min_price, max_price)
+    if bands is not None and max_price is not None and Product.objects.filter(price=max_price).exists():
+        # max_price is inclusive, but it's also where the next band starts:
+        # the rollup can't tell products priced exactly at it from the rest
+        bands = None
+    if bands is None:
+        live = filter_products({"min_price": min_price, "max_price": max_price})
+        rows = list(_live_rows(live))
+        bands = (0, len(PRICE_BANDS))
+    else:
+        rows = list(
+            ProductFacetCount.objects.filter(count__gt=0)
+            .values_list("category", "price_band", "in_stock", "is_active", "count")
+        )
+
+    def matches(row, skip):
+        c, b, s, a, _ = row
+        return (
+            (skip == "category" or category is None or c == category)
+            and (skip == "price" or bands[0] <= b < bands[1])
+            and (skip == "in_stock" or in_stock is None or s == in_stock)
+            and (is_active is None or a == is_active)
+        )
+
+    categories, price_counts, availability = Counter(), Counter(), Counter()
+    total = 0
+    for row in rows:
+        n = row[4]
+        if matches(row, "category"):
+            categories[row[0]] += n
+        if matches(row, "price"):
+            price_counts[row[1]] += n
+        if matches(row, "in_stock"):
+            availability[row[2]] += n
+        if matches(row, None):
+            total += n
+
+    return {
+        "total": total,
+        "categories": [
+            {"value": c, "count": n}
+            for c, n in sorted(categories.items(), key=lambda item: (-item[1], item[0])) if n
+        ],
+        "price_bands": [
+            {
+                "min": float(PRICE_BANDS[i]),
+                "max": float(PRICE_BANDS[i + 1]) if i + 1 < len(PRICE_BANDS) else None,
+                "count": price_counts[i],
+            }
+            for i in range(len(PRICE_BANDS))
+        ],
+        "availability": {"in_stock": availability[True], "out_of_stock": availability[False]},
+    }
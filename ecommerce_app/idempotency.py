@@ -0,0 +1,158 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache_key(scope, key):
+    return f"idempotency:{scope}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _mismatch():
+    return Response(
+        {"error": f"{HEADER} was already used for a different request."},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+def _replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return _mismatch()
+    response = Response(stored["body"], status=stored["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _completed(record):
+    return {"fingerprint": record.fingerprint, "status": record.response_status, "body": record.response_body}
+
+
+def _claim(scope, key, fingerprint):
+    """
+    Insert the in-progress marker. Returns (True, None) if this request owns
+    the key, else (False, existing_record).
+    """
+    # plain read first: replays (the common case for a known key) cost one query
+    record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(scope=scope, key=key, fingerprint=fingerprint)
+            return True, None
+        except IntegrityError:
+            # lost the race to a concurrent duplicate
+            record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if record is None:
+                return _claim(scope, key, fingerprint)  # its owner gave up; try again
+    if record.state == IdempotencyKey.IN_PROGRESS:
+        # an owner that died mid-request leaves a stale marker; take it over
+        stale_before = timezone.now() - timedelta(seconds=_setting("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, state=IdempotencyKey.IN_PROGRESS, updated_at__lt=stale_before
+        ).update(fingerprint=fingerprint, updated_at=timezone.now())
+        if taken:
+            return True, None
+    return False, record
+
+
+def _wait_for(scope, key, record):
+    """Poll until a concurrent duplicate finishes; None if it takes too long."""
+    deadline = time.monotonic() + _setting("IDEMPOTENCY_WAIT_TIMEOUT", 5)
+    cache_key = _cache_key(scope, key)
+    while record is not None and record.state == IdempotencyKey.IN_PROGRESS:
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return stored
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return _completed(record) if record is not None else None
+
+
+def idempotent(scope):
+    """
+    Honour an ``Idempotency-Key`` header on an APIView method: the first
+    request with a key runs and its (non-5xx) response is stored; repeats
+    are answered from the cache or the IdempotencyKey table without
+    touching the handler, and a duplicate that arrives while the first is
+    still running waits for its result instead of executing again.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return method(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({"error": f"{HEADER} is too long."}, status=status.HTTP_400_BAD_REQUEST)
+            # keys are per user: two clients picking the same key must not
+            # get each other's responses
+            owner_scope = f"{scope}:{request.user.pk}" if request.user.is_authenticated else scope
+
+            fingerprint = _fingerprint(request)
+            cache_key = _cache_key(owner_scope, key)
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            owner, record = _claim(owner_scope, key, fingerprint)
+            if not owner:
+                if record.state == IdempotencyKey.COMPLETED:
+                    stored = _completed(record)
+                elif record.fingerprint != fingerprint:
+                    return _mismatch()
+                else:
+                    stored = _wait_for(owner_scope, key, record)
+                if stored is None:
+                    return Response(
+                        {"error": "A request with this Idempotency-Key is still in progress."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                cache.set(cache_key, stored, _setting("IDEMPOTENCY_TTL", 86400))
+                return _replay(stored, fingerprint)
+
+            try:
+                response = method(view, request, *args, **kwargs)
+            except Exception:
+                IdempotencyKey.objects.filter(scope=owner_scope, key=key).delete()
+                raise
+            if response.status_code >= 500:
+                # let the client retry for real
+                IdempotencyKey.objects.filter(scope=owner_scope, key=key).delete()
+                return response
+
+            data = getattr(response, "data", None)
+            IdempotencyKey.objects.filter(scope=owner_scope, key=key).update(
+                state=IdempotencyKey.COMPLETED, response_status=response.status_code,
+                response_body=data, updated_at=timezone.now(),
+            )
+            stored = {"fingerprint": fingerprint, "status": response.status_code, "body": data}
+            cache.set(cache_key, stored, _setting("IDEMPOTENCY_TTL", 86400))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,206 @@
+import csv
+import json
+import time
+from collections import Counter
+
+from django.db import DatabaseError, transaction
+
+from . import catalog_cache, facets, search
+from .catalog import InvalidProduct, clean_product_data
+from .models import Product
+
+
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# columns rewritten when an incoming row matches an existing sku
+UPSERT_FIELDS = ["name", "price", "description", "category", "stock", "image", "updated_at"]
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def guess_format(filename, default="csv"):
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def _guarded(rows, first=1):
+    """
+    Number ``rows`` and turn decoding failures into per-row errors instead
+    of exceptions in the middle of an import. A bad CSV record is skipped;
+    bytes that aren't UTF-8 end the file there (rows before it still count).
+    """
+    number = first - 1
+    while True:
+        number += 1
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            yield number, InvalidProduct("Not valid UTF-8; the rest of the file was skipped.")
+            return
+        except csv.Error as exc:
+            yield number, InvalidProduct(f"Malformed CSV: {exc}")
+            continue
+        yield number, row
+
+
+def parse_rows(stream, fmt):
+    """
+    Yield (row_number, data) from a text stream one row at a time; rows
+    that can't be decoded come back as (row_number, InvalidProduct).
+    """
+    if fmt == "csv":
+        yield from _guarded(iter(csv.DictReader(stream)))
+    elif fmt == "jsonl":
+        for number, line in _guarded(iter(stream)):
+            if isinstance(line, Exception):
+                yield number, line
+                continue
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                yield number, InvalidProduct("Invalid JSON.")
+                continue
+            if not isinstance(data, dict):
+                yield number, InvalidProduct("Each line must be a JSON object.")
+                continue
+            yield number, data
+    else:
+        raise ValueError(fmt)
+
+
+def text_stream(binary):
+    """
+    Lines of an uploaded file, decoded one at a time so a bad byte only
+    stops the import at its own line (TextIOWrapper decodes in 8 KB chunks,
+    which would lose the good rows before it in the same chunk).
+    """
+    for line in binary:
+        yield line.decode("utf-8")
+
+
+def _write_batch(batch):
+    """
+    Upsert one batch; returns the ids touched so the search index and
+    catalog cache can be refreshed. bulk_create sends no signals, so the
+    facet rollup is adjusted here, inside the batch's transaction.
+    """
+    keyed = [p for p in batch if p.sku]
+    unkeyed = [p for p in batch if not p.sku]
+    ids = []
+    deltas = Counter()
+    if keyed:
+        existing = {
+            row[0]: row[1:]
+            for row in Product.objects.filter(sku__in=[p.sku for p in keyed])
+            .values_list("sku", *facets.FACET_FIELDS)
+        }
+        for p in keyed:
+            old = existing.get(p.sku)
+            if old is not None:
+                deltas[facets.facet_key(*old)] -= 1
+            # is_active isn't an upsert field, so an existing row keeps its own
+            is_active = old[3] if old is not None else p.is_active
+            deltas[facets.facet_key(p.category, p.price, p.stock, is_active)] += 1
+        Product.objects.bulk_create(
+            keyed, update_conflicts=True, unique_fields=["sku"], update_fields=UPSERT_FIELDS,
+        )
+        ids += Product.objects.filter(sku__in=[p.sku for p in keyed]).values_list("id", flat=True)
+    if unkeyed:
+        ids += [p.pk for p in Product.objects.bulk_create(unkeyed)]
+        deltas.update(facets.product_key(p) for p in unkeyed)
+    facets.apply_deltas(deltas)
+    return ids
+
+
+def _flush(pending, result):
+    # later rows win when a feed repeats a sku inside one batch; ON CONFLICT
+    # can't touch the same row twice in a single statement
+    by_key = {}
+    for number, product in pending:
+        by_key[product.sku or ("row", number)] = (number, product)
+    rows = list(by_key.values())
+
+    try:
+        with transaction.atomic():
+            ids = _write_batch([product for _, product in rows])
+        result.upserted += len(pending)
+    except DatabaseError:
+        # isolate the offending rows instead of dropping the whole batch
+        ids = []
+        for number, product in rows:
+            try:
+                with transaction.atomic():
+                    ids += _write_batch([product])
+                result.upserted += 1
+            except DatabaseError as exc:
+                result.error(number, str(exc).strip() or "Database error.")
+        result.upserted += len(pending) - len(rows)
+
+    ids = [pk for pk in ids if pk is not None]
+    if ids:
+        search.index_products(ids)
+        catalog_cache.invalidate_product(*ids)
+
+
+def import_products(rows, batch_size=BATCH_SIZE, created_by_id=None):
+    """
+    Validate rows with the AddProductView rules and upsert them on sku in
+    batches of ``batch_size``, each in its own transaction. Bad rows are
+    reported in the result and never abort the run.
+    """
+    result = ImportResult()
+    pending = []
+    for number, data in rows:
+        result.rows += 1
+        if isinstance(data, Exception):
+            result.error(number, str(data))
+            continue
+        try:
+            fields = clean_product_data(data)
+        except InvalidProduct as exc:
+            result.error(number, str(exc))
+            continue
+        pending.append((number, Product(created_by_id=created_by_id, **fields)))
+        if len(pending) >= batch_size:
+            _flush(pending, result)
+            pending = []
+    if pending:
+        _flush(pending, result)
+    result.elapsed = time.monotonic() - result.started
+    return result
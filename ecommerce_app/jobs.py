@@ -0,0 +1,162 @@
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 10       # seconds before the first retry; doubles per attempt
+BACKOFF_MAX = 3600
+LOCK_TIMEOUT = 600      # a job running longer than this is assumed to have lost its worker
+
+_registry = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(name=None, max_attempts=5):
+    """Register a function as a job handler; it's called with the job's payload as kwargs."""
+    def decorator(func):
+        func.job_name = name or f"{func.__module__}.{func.__name__}"
+        func.max_attempts = max_attempts
+        _registry[func.job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(handler, *, delay=None, run_at=None, **payload):
+    """
+    Queue ``handler`` (a @task function or its registered name) to run with
+    ``payload`` in a worker. The row is written in the caller's transaction,
+    so work queued by a request that rolls back never runs.
+
+    With JOBS_EAGER = True the handler runs inline instead (local
+    development, tests).
+    """
+    func = _registry[handler] if isinstance(handler, str) else handler
+    if _setting("JOBS_EAGER", False):
+        func(**payload)
+        return None
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta(0))
+    return Job.objects.create(
+        name=func.job_name, payload=payload, run_at=run_at, max_attempts=func.max_attempts
+    )
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_rows(model, due_field, running_state, batch_size, **extra):
+    """
+    Take up to ``batch_size`` due rows from a queue table (state, attempts,
+    locked_at and a due-time column). SELECT ... FOR UPDATE SKIP LOCKED
+    lets any number of workers poll the same table without handing a row
+    to two of them or queueing behind each other's locks.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            model.objects.select_for_update(skip_locked=True)
+            .filter(state=model.QUEUED, **{f"{due_field}__lte": now})
+            .order_by(due_field, "id")[:batch_size]
+        )
+        if rows:
+            model.objects.filter(pk__in=[r.pk for r in rows]).update(
+                state=running_state, locked_at=now, attempts=F("attempts") + 1, **extra
+            )
+            for row in rows:
+                row.state, row.locked_at, row.attempts = running_state, now, row.attempts + 1
+    return rows
+
+
+def requeue_rows(model, running_state, timeout, **extra):
+    """Put rows whose worker died mid-run (locked longer than ``timeout`` seconds) back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return model.objects.filter(state=running_state, locked_at__lt=cutoff).update(
+        state=model.QUEUED, locked_at=None, **extra
+    )
+
+
+def retry_or_fail(row, due_field, error, **extra):
+    """
+    Record a failed attempt: back in the queue after a backoff, or FAILED
+    once max_attempts are used up. Returns the new (state, due time).
+    """
+    model = type(row)
+    if row.attempts >= row.max_attempts:
+        state, due = model.FAILED, getattr(row, due_field)
+        logger.error("%s %s failed for good after %s attempts", model.__name__, row, row.attempts)
+    else:
+        state, due = model.QUEUED, timezone.now() + backoff(row.attempts)
+        logger.warning("%s %s failed (attempt %s), retrying at %s", model.__name__, row, row.attempts, due)
+    model.objects.filter(pk=row.pk).update(
+        state=state, locked_at=None, last_error=error, **{due_field: due}, **extra
+    )
+    return state, due
+
+
+def claim(batch_size=10):
+    """Take up to ``batch_size`` due jobs."""
+    return claim_rows(Job, "run_at", Job.RUNNING, batch_size, updated_at=timezone.now())
+
+
+def requeue_stale():
+    """Put jobs whose worker died mid-run back in the queue."""
+    return requeue_rows(
+        Job, Job.RUNNING, _setting("JOBS_LOCK_TIMEOUT", LOCK_TIMEOUT), updated_at=timezone.now()
+    )
+
+
+def run(job):
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"No task registered as {job.name!r}")
+        func(**job.payload)
+    except Exception:
+        retry_or_fail(job, "run_at", traceback.format_exc(), updated_at=timezone.now())
+        return False
+    Job.objects.filter(pk=job.pk).update(state=Job.DONE, locked_at=None, updated_at=timezone.now())
+    return True
+
+
+def work(stop=None, batch_size=10, poll_interval=1.0, once=False):
+    """
+    Worker loop: claim due jobs and run them until ``stop`` is set, or
+    until the queue is empty when ``once`` is true. Returns jobs processed.
+    """
+    stop = stop or threading.Event()
+    processed = 0
+    while not stop.is_set():
+        if not transaction.get_connection().in_atomic_block:
+            close_old_connections()  # long-lived loop: honour CONN_MAX_AGE, drop broken connections
+        try:
+            requeue_stale()
+            jobs = claim(batch_size)
+        except DatabaseError:
+            # lost connection, lock timeout...: back off and poll again
+            logger.exception("Polling the job queue failed")
+            stop.wait(poll_interval)
+            continue
+        for job in jobs:
+            run(job)
+            processed += 1
+        if not jobs:
+            if once:
+                break
+            stop.wait(poll_interval)
+    return processed
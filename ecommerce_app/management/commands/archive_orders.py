@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ecommerce_app import archive
+
+
+class Command(BaseCommand):
+    help = "Move Delivered/Cancelled orders older than --older-than days to compressed archive segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, required=True, help="Age in days.")
+        parser.add_argument("--chunk-size", type=int, default=archive.CHUNK_SIZE,
+                            help="Orders moved per transaction.")
+        parser.add_argument("--notifications", action="store_true",
+                            help="Also move read notifications older than the cutoff.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        moved = archive.archive_orders(cutoff, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders created before {cutoff:%Y-%m-%d}."))
+        if options["notifications"]:
+            moved = archive.archive_notifications(cutoff, chunk_size=options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"Archived {moved} read notifications."))
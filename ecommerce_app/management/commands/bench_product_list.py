@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Time rendering one product list page with cold and warm card fragment caches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=48)
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        # synthetic rows shaped like ProductListView.build_page; no DB involved
+        now = timezone.now()
+        products = [
+            {
+                "id": 10_000_000 + i, "name": f"Benchmark product {i}", "category": "Bench",
+                "stock": i % 7, "price": Decimal("199.00") + i, "image": "",
+                "blurb": "Lorem ipsum dolor sit amet " * 6,
+                "created_at": now - timedelta(seconds=i), "updated_at": now,
+            }
+            for i in range(options["cards"])
+        ]
+        context = {"products": products, "next_url": "?cursor=x"}
+        request = RequestFactory().get("/ui/product_list/")
+        iterations = options["iterations"]
+
+        def render():
+            render_to_string("e-com/product_list.html", context, request=request)
+
+        render()  # load and parse the template once
+
+        # a fresh updated_at per pass misses every card without clearing the
+        # (possibly shared) cache
+        started = time.perf_counter()
+        for n in range(iterations):
+            stamp = now + timedelta(microseconds=n + 1)
+            for p in products:
+                p["updated_at"] = stamp
+            render()
+        cold = (time.perf_counter() - started) / iterations * 1000
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        warm = (time.perf_counter() - started) / iterations * 1000
+
+        self.stdout.write(f"{options['cards']} cards, {iterations} renders each")
+        self.stdout.write(f"  cold fragment cache: {cold:.2f} ms/page")
+        self.stdout.write(f"  warm fragment cache: {warm:.2f} ms/page ({cold / warm:.1f}x)")
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import exports
+
+
+class Command(BaseCommand):
+    help = "Stream the full product catalog as JSON Lines or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=exports.FORMATS, default="jsonl")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout).")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output on the fly.")
+        parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunks = exports.export_catalog(
+            options["format"], gzip=options["gzip"], chunk_size=options["chunk_size"]
+        )
+        if options["output"]:
+            with open(options["output"], "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Catalog written to {options['output']}"))
+        else:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
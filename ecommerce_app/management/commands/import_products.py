@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce_app import imports
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert products (keyed on sku) from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=imports.FORMATS,
+                            help="Input format (default: from the file extension).")
+        parser.add_argument("--batch-size", type=int, default=imports.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or imports.guess_format(options["path"])
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        try:
+            fh = open(options["path"], "rb")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with fh:
+            result = imports.import_products(
+                imports.parse_rows(imports.text_stream(fh), fmt), batch_size=options["batch_size"]
+            )
+
+        for error in result.errors:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... {result.failed - len(result.errors)} more errors not shown")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.upserted} upserted, {result.failed} failed of {result.rows} rows "
+            f"in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/sec)"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import otp_store
+
+
+class Command(BaseCommand):
+    help = "Delete password-reset OTP rows older than OTP_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=otp_store.PURGE_CHUNK, help="Rows deleted per query.")
+
+    def handle(self, *args, **options):
+        deleted = otp_store.purge_expired(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired OTPs."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import ratelimit
+
+
+class Command(BaseCommand):
+    help = "Show how many login/OTP requests the rate limiter rejected, per scope and key."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters afterwards.")
+
+    def handle(self, *args, **options):
+        for scope, counts in ratelimit.rejections().items():
+            for dimension, n in counts.items():
+                self.stdout.write(f"{scope} by {dimension}: {n}")
+        if options["reset"]:
+            ratelimit.reset_rejections()
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import catalog_cache, facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the product facet rollup table from scratch."
+
+    def handle(self, *args, **options):
+        facets.rebuild()
+        catalog_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS("Facet counts rebuilt."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import sales
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales rollup table from order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Orders read per query.")
+
+    def handle(self, *args, **options):
+        rows = sales.rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Sales rollup rebuilt ({rows} rows)."))
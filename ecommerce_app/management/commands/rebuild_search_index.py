@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import search
+
+
+class Command(BaseCommand):
+    help = "Recompute the product search index (e.g. after a raw SQL load)."
+
+    def handle(self, *args, **options):
+        search.get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import reservations
+
+
+class Command(BaseCommand):
+    help = "Give the stock held by expired cart reservations back to the products. Run every minute or so."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=reservations.SWEEP_BATCH)
+
+    def handle(self, *args, **options):
+        released = reservations.release_expired(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservations."))
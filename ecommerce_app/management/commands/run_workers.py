@@ -0,0 +1,60 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ecommerce_app import jobs
+
+
+def _thread_worker(stop, options):
+    try:
+        jobs.work(stop, options["batch_size"], options["poll_interval"], options["once"])
+    finally:
+        connections.close_all()
+
+
+def _process_worker(options):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    _thread_worker(stop, options)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers against the Job table until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of workers.")
+        parser.add_argument("--pool", choices=("thread", "process"), default="thread",
+                            help="Run workers as threads (I/O-bound jobs) or processes (CPU-bound jobs).")
+        parser.add_argument("--batch-size", type=int, default=5, help="Jobs claimed per poll.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument("--once", action="store_true", help="Exit once no jobs are due.")
+
+    def handle(self, *args, **options):
+        concurrency = max(options["concurrency"], 1)
+        if options["pool"] == "process":
+            connections.close_all()  # children must not share the parent's sockets
+            workers = [multiprocessing.Process(target=_process_worker, args=(options,)) for _ in range(concurrency)]
+        else:
+            stop = threading.Event()
+            workers = [threading.Thread(target=_thread_worker, args=(stop, options)) for _ in range(concurrency)]
+
+        self.stdout.write(f"Starting {concurrency} {options['pool']} worker(s).")
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; waiting for running jobs to finish.")
+            if options["pool"] == "process":
+                for worker in workers:
+                    worker.terminate()  # SIGTERM: the worker stops after its current batch
+            else:
+                stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import outbox
+
+
+class Command(BaseCommand):
+    help = "Send everything due in the email outbox now (the job workers normally do this)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=outbox.BATCH_SIZE, help="Messages per connection.")
+
+    def handle(self, *args, **options):
+        sent = outbox.flush(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails."))
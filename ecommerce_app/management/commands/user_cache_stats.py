@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce_app import users
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the shared user resolver, summed over all processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters afterwards.")
+
+    def handle(self, *args, **options):
+        totals = users.stats()
+        for name in users.COUNTERS:
+            self.stdout.write(f"{name}: {totals[name]}")
+        rate = totals["hit_rate"]
+        self.stdout.write(f"hit_rate: {'n/a' if rate is None else f'{rate:.1%}'}")
+        if options["reset"]:
+            users.reset_stats()
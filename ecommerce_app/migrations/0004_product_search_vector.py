@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-18 02:22
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN indexes only exist on PostgreSQL; SQLite runs use the in-process
+# inverted index from ecommerce_app.search instead.
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS product_search_vector_gin ON ecommerce_app_product USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_gin ON ecommerce_app_product USING gin (name gin_trgm_ops)",
+]
+DROP_INDEXES = [
+    "DROP INDEX IF EXISTS product_search_vector_gin",
+    "DROP INDEX IF EXISTS product_name_trgm_gin",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    Product = apps.get_model("ecommerce_app", "Product")
+    Product.objects.update(search_vector=(
+        SearchVector("name", weight="A", config="english")
+        + SearchVector("category", weight="B", config="english")
+        + SearchVector("description", weight="C", config="english")
+    ))
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in DROP_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0003_product_catalog_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-18 02:28
+
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# frozen copy of ecommerce_app.facets.PRICE_BANDS at the time of this migration
+PRICE_BANDS = [Decimal(b) for b in ("0", "500", "1000", "2500", "5000", "10000", "25000", "50000")]
+
+
+def backfill_facets(apps, schema_editor):
+    Product = apps.get_model("ecommerce_app", "Product")
+    ProductFacetCount = apps.get_model("ecommerce_app", "ProductFacetCount")
+    counts = Counter()
+    rows = Product.objects.values_list("category", "price", "stock", "is_active")
+    for category, price, stock, is_active in rows.iterator(chunk_size=2000):
+        band = max(bisect_right(PRICE_BANDS, price) - 1, 0)
+        counts[(category or "", band, stock > 0, is_active)] += 1
+    ProductFacetCount.objects.bulk_create(
+        ProductFacetCount(category=c, price_band=b, in_stock=s, is_active=a, count=n)
+        for (c, b, s, a), n in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0006_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('price_band', models.PositiveSmallIntegerField()),
+                ('in_stock', models.BooleanField()),
+                ('is_active', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productfacetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'price_band', 'in_stock', 'is_active'), name='unique_facet_key'),
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
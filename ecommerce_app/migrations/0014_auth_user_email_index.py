@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 03:05
+
+from django.db import migrations
+
+
+# auth_user belongs to django.contrib.auth, so the index is plain SQL rather
+# than Meta.indexes. It serves the exact-email lookups in users.by_email.
+# On PostgreSQL it is built CONCURRENTLY so a live users table isn't locked
+# against writes; hence atomic = False.
+
+
+def create_email_index(apps, schema_editor):
+    concurrently = "CONCURRENTLY " if schema_editor.connection.vendor == "postgresql" else ""
+    schema_editor.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS auth_user_email_idx ON auth_user (email)")
+
+
+def drop_email_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS auth_user_email_idx")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('ecommerce_app', '0013_archived_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-18 03:20
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_order_counts(apps, schema_editor):
+    OrderItem = apps.get_model("ecommerce_app", "OrderItem")
+    ArchivedOrder = apps.get_model("ecommerce_app", "ArchivedOrder")
+    SalesOrderCount = apps.get_model("ecommerce_app", "SalesOrderCount")
+    tz = timezone.get_current_timezone()
+    counts = Counter()
+    # orders with items, as the rollup counts them, plus the archived ones
+    live = (
+        OrderItem.objects.order_by()
+        .values_list(TruncDate("order__created_at", tzinfo=tz), "order__status")
+        .annotate(Count("order_id", distinct=True))
+    )
+    archived = (
+        ArchivedOrder.objects.order_by()
+        .values_list(TruncDate("created_at", tzinfo=tz), "status")
+        .annotate(Count("order_id"))
+    )
+    for day, status, n in [*live, *archived]:
+        counts[(day, status)] += n
+    SalesOrderCount.objects.bulk_create(
+        SalesOrderCount(day=d, status=s, orders=n) for (d, s), n in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce_app', '0017_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesOrderCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='salesordercount',
+            constraint=models.UniqueConstraint(fields=('day', 'status'), name='unique_sales_order_count_key'),
+        ),
+        migrations.RunPython(backfill_order_counts, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,18 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
 
 class Product(models.Model):
+    # supplier/natural key used by the bulk importer to upsert
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.DecimalField(
@@ -14,6 +20,8 @@ class Product(models.Model):
     )
     category = models.CharField(max_length=100, blank=True)
     stock = models.PositiveIntegerField(default=0)
+    # units held by live cart reservations; maintained by ecommerce_app.reservations
+    reserved = models.PositiveIntegerField(default=0, editable=False)
     image = models.URLField(blank=True, null=True)  # ✅ Add this line
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey(
@@ -21,22 +29,117 @@ class Product(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # maintained by ecommerce_app.search; GIN indexed on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ("-created_at",)
+        # Keyset pagination walks (created_at, id) newest-first; the partial
+        # indexes cover the storefront filters without scanning inactive or
+        # sold-out rows.
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="product_created_idx"),
+            models.Index(fields=["category", "-created_at", "-id"], name="product_category_created_idx"),
+            models.Index(
+                fields=["-created_at", "-id"], name="product_active_created_idx",
+                condition=Q(is_active=True),
+            ),
+            models.Index(
+                fields=["-created_at", "-id"], name="product_in_stock_created_idx",
+                condition=Q(is_active=True, stock__gt=0),
+            ),
+            models.Index(fields=["price"], name="product_price_idx"),
+            # MAX(updated_at) for conditional GET validators
+            models.Index(fields=["updated_at"], name="product_updated_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # ``reserved`` only ever changes through UPDATE ... F() in
+        # ecommerce_app.reservations; don't write back a stale copy of it
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            skip = {"reserved", *self.get_deferred_fields()}
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.attname not in skip
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def available(self):
+        """Stock that can still be sold or put in a cart."""
+        return max(self.stock - self.reserved, 0)
 
     def __str__(self):
         return f"{self.name} ({self.price})"
 
 
+class ProductFacetCount(models.Model):
+    # Rollup of Product counts by facet key, kept current by ecommerce_app.facets
+    # so storefront facet counts never scan the product table.
+    category = models.CharField(max_length=100, blank=True)
+    price_band = models.PositiveSmallIntegerField()
+    in_stock = models.BooleanField()
+    is_active = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "price_band", "in_stock", "is_active"], name="unique_facet_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.category or '-'} / band {self.price_band}: {self.count}"
+
+
+class SalesRollup(models.Model):
+    # Orders, units and revenue by day x category x order status, kept
+    # current by ecommerce_app.sales so reports never scan Order/OrderItem.
+    day = models.DateField()
+    category = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "category", "status"], name="unique_sales_rollup_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category or '-'} {self.status}: {self.revenue}"
+
+
+class SalesOrderCount(models.Model):
+    # Distinct orders by day x order status. SalesRollup counts an order
+    # once in every category it has items in, so reports that don't group
+    # or filter by category take their order counts from here.
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status"], name="unique_sales_order_count_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders}"
+
 
 class PasswordResetOTP(models.Model):
     # One active OTP per user; update_or_create in views
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="password_reset_otp")
     otp = models.CharField(max_length=6)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # default validity 15 minutes; your views check this
+    class Meta:
+        # purge_expired_otps walks expired rows by age
+        indexes = [models.Index(fields=["created_at"], name="otp_created_idx")]
+
+    # default validity 15 minutes; otp_store.ModelOTPStore checks this
     def is_expired(self, minutes: int = 15) -> bool:
         return timezone.now() > self.created_at + timedelta(minutes=minutes)
 
@@ -87,6 +190,23 @@ class Address(models.Model):
         return f"{self.user.username}: {self.street}, {self.city}"
 
 
+class Reservation(models.Model):
+    # Stock held for a cart line until expires_at; see ecommerce_app.reservations
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reservations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "product"], name="unique_reservation"),
+        ]
+        indexes = [models.Index(fields=["expires_at"], name="reservation_expires_idx")]
+
+    def __str__(self):
+        return f"{self.user_id} holds {self.quantity} x {self.product_id} until {self.expires_at}"
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("Pending", "Pending"),
@@ -107,11 +227,44 @@ class Order(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            # per-user order history, newest first
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # drop the cached detail snapshot, and write a fresh one once the
+        # order is Delivered/Cancelled (QuerySet.update bypasses this);
+        # open orders skip the rebuild and its join entirely
+        from .orders import FINAL_STATUSES, refresh_snapshot, snapshot_key
+        pk = self.pk
+        if self.status in FINAL_STATUSES:
+            transaction.on_commit(lambda: refresh_snapshot(pk))
+        else:
+            transaction.on_commit(lambda: cache.delete(snapshot_key(pk)))
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username} - {self.status}"
 
 
+class ArchivedOrder(models.Model):
+    # Where an order moved to cold storage by `manage.py archive_orders` lives:
+    # a gzip member of ``length`` bytes at ``offset`` in ``segment`` (relative
+    # to ORDER_ARCHIVE_DIR), holding that order's JSON detail document.
+    order_id = models.BigIntegerField(primary_key=True)
+    user_id = models.IntegerField()
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    segment = models.CharField(max_length=255)
+    offset = models.BigIntegerField()
+    length = models.IntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order #{self.order_id} in {self.segment}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
@@ -141,6 +294,102 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            # the keyset-paginated inbox, and the unread badge / ?unread=true page
+            models.Index(fields=["user", "-created_at", "-id"], name="notification_user_created_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="notification_unread_idx",
+                         condition=Q(is_read=False)),
+        ]
+
+    def __str__(self):
+        return f"Notif for {self.user.username}: {self.message[:40]}"
+
+
+class IdempotencyKey(models.Model):
+    # Client-supplied Idempotency-Key per endpoint, with the response that was
+    # sent for it so retries can be replayed instead of re-executed.
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    STATE_CHOICES = [(IN_PROGRESS, "In progress"), (COMPLETED, "Completed")]
+
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [models.Index(fields=["created_at"], name="idempotency_created_idx")]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.state})"
+
+
+class Job(models.Model):
+    # Background work queued by ecommerce_app.jobs.enqueue and run by
+    # `manage.py run_workers`.
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATE_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # what the workers poll: due queued jobs, oldest first
+            models.Index(fields=["run_at", "id"], name="job_due_idx", condition=Q(state="queued")),
+            models.Index(fields=["state", "locked_at"], name="job_state_locked_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.state})"
+
+
+class OutgoingEmail(models.Model):
+    # Mail queued by ecommerce_app.outbox.queue_email and sent in batches,
+    # over one SMTP connection each, by the outbox job in `manage.py run_workers`.
+    QUEUED = "queued"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATE_CHOICES = [(QUEUED, "Queued"), (SENDING, "Sending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    send_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # what the sender polls: due queued mail, oldest first
+            models.Index(fields=["send_after", "id"], name="email_due_idx", condition=Q(state="queued")),
+            models.Index(fields=["state", "locked_at"], name="email_state_locked_idx"),
+        ]
 
     def __str__(self):
-        return f"Notif for {self.user.username}: {self.message[:40]}"
\ No newline at end of file
+        return f"{self.subject!r} to {', '.join(self.to)} ({self.state})"
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+
+
+def unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _timeout():
+    # bounds drift from writes that bypass the counter (queryset.update, bulk_create)
+    return getattr(settings, "NOTIFICATION_UNREAD_TIMEOUT", 3600)
+
+
+def unread_count(user_id):
+    """
+    The user's unread badge count. Kept in the cache and adjusted as
+    notifications are created and read; a miss is one COUNT(*) over the
+    partial unread index.
+    """
+    count = cache.get(unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(unread_key(user_id), count, _timeout())
+    return max(count, 0)
+
+
+def adjust_unread(user_id, delta):
+    """Move the counter by ``delta`` once the write commits; a missing counter is recounted on the next read."""
+    def apply():
+        try:
+            cache.incr(unread_key(user_id), delta)
+        except ValueError:
+            pass
+    if delta:
+        transaction.on_commit(apply)
+
+
+def forget_unread(user_id):
+    transaction.on_commit(lambda: cache.delete(unread_key(user_id)))
+
+
+def mark_read(user_id, ids=None):
+    """
+    Mark the user's unread notifications (all, or just ``ids``) read in
+    one UPDATE and take exactly the rows it changed off the counter.
+    Returns that number.
+    """
+    unread = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        unread = unread.filter(pk__in=ids)
+    updated = unread.update(is_read=True)
+    adjust_unread(user_id, -updated)
+    return updated
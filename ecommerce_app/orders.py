@@ -0,0 +1,141 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .catalog import InvalidFilter
+from .models import Order
+from .projection import ORDER_DETAIL
+
+
+STATUSES = {value for value, _ in Order.STATUS_CHOICES}
+# an order's contents can't change any more once it's in one of these
+FINAL_STATUSES = ("Delivered", "Cancelled")
+
+ADDRESS_COLUMNS = {
+    "street": "shipping_address__street",
+    "city": "shipping_address__city",
+    "state": "shipping_address__state",
+    "zip_code": "shipping_address__zip_code",
+}
+ITEM_COLUMNS = {
+    "product_name": "items__product__name",
+    "quantity": "items__quantity",
+    "price": "items__price_at_purchase",
+    "subtotal": "items__subtotal",
+}
+
+
+def parse_iso_date(value):
+    if value is None or value == "":
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise InvalidFilter(value)
+    return day
+
+
+def parse_day(value):
+    day = parse_iso_date(value)
+    if day is None:
+        return None
+    # a range on the raw column keeps the (user, created_at) index usable,
+    # which created_at__date would not
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_orders(params, queryset=None):
+    """
+    Apply the order history filters (status, date_from, date_to; dates are
+    inclusive YYYY-MM-DD) from a query dict. Raises InvalidFilter on bad input.
+    """
+    qs = Order.objects.all() if queryset is None else queryset
+
+    statuses = [s for s in params.get("status", "").split(",") if s]
+    if any(s not in STATUSES for s in statuses):
+        raise InvalidFilter(params.get("status"))
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+
+    date_from = parse_day(params.get("date_from"))
+    if date_from is not None:
+        qs = qs.filter(created_at__gte=date_from)
+    date_to = parse_day(params.get("date_to"))
+    if date_to is not None:
+        qs = qs.filter(created_at__lt=date_to + timedelta(days=1))
+    return qs
+
+
+def load_orders(queryset, fields=ORDER_DETAIL.presets["full"], extra=()):
+    """
+    Order detail documents for ``fields`` in a single query: user and
+    address are joined in, and items come back LEFT JOINed as one row
+    each. Yields (document, row) per order, in id order; ``row`` also
+    carries id, status, updated_at and any ``extra`` columns.
+    """
+    columns = ORDER_DETAIL.select(fields, "id", "status", "updated_at", *extra)
+    if "shipping_address" in fields:
+        columns += ADDRESS_COLUMNS.values()
+    if "items" in fields:
+        columns += ["items__id", *ITEM_COLUMNS.values()]
+    rows = queryset.values(*columns).order_by("id", *(["items__id"] if "items" in fields else []))
+
+    for _, group in groupby(rows, key=itemgetter("id")):
+        group = list(group)
+        first = group[0]
+        document = ORDER_DETAIL.render(first, fields)
+        if "shipping_address" in fields:
+            address = None
+            if first["shipping_address__street"] is not None:
+                address = {key: first[column] for key, column in ADDRESS_COLUMNS.items()}
+            document["shipping_address"] = address
+        if "items" in fields:
+            document["items"] = [{
+                "product_name": row["items__product__name"],
+                "quantity": row["items__quantity"],
+                "price": float(row["items__price_at_purchase"]),
+                "subtotal": float(row["items__subtotal"]),
+            } for row in group if row["items__id"] is not None]
+        yield document, first
+
+
+def load_order(pk, fields=ORDER_DETAIL.presets["full"]):
+    """One order's detail document: (document, status, updated_at), or None."""
+    for document, row in load_orders(Order.objects.filter(pk=pk), fields):
+        return document, row["status"], row["updated_at"]
+    return None
+
+
+def snapshot_key(pk):
+    return f"order:snapshot:{pk}"
+
+
+def get_snapshot(pk):
+    """Cached full detail document of a finished order, or None."""
+    return cache.get(snapshot_key(pk))
+
+
+def build_snapshot(pk):
+    loaded = load_order(pk)
+    if loaded is None or loaded[1] not in FINAL_STATUSES:
+        return None
+    document, _, updated_at = loaded
+    return cache_snapshot(pk, document, updated_at)
+
+
+def cache_snapshot(pk, document, updated_at):
+    snapshot = {"order": document, "updated_at": updated_at}
+    cache.set(snapshot_key(pk), snapshot, getattr(settings, "ORDER_SNAPSHOT_TIMEOUT", 7 * 86400))
+    return snapshot
+
+
+def refresh_snapshot(pk):
+    cache.delete(snapshot_key(pk))
+    build_snapshot(pk)
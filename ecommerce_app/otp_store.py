@@ -0,0 +1,150 @@
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import PasswordResetOTP
+
+
+# verify() results
+VALID = "valid"
+INVALID = "invalid"
+MISSING = "missing"
+EXPIRED = "expired"
+LOCKED = "locked"
+
+DEFAULT_STORE = "ecommerce_app.otp_store.CacheOTPStore"
+PURGE_CHUNK = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def ttl():
+    return _setting("OTP_TTL", 900)
+
+
+def max_attempts():
+    return _setting("OTP_MAX_ATTEMPTS", 5)
+
+
+def generate():
+    return f"{secrets.randbelow(10 ** 6):06d}"
+
+
+class CacheOTPStore:
+    """
+    OTPs in the cache: expiry is the entry's TTL, wrong guesses are an
+    atomic incr, and nothing is written to the database. Only an HMAC of
+    the code is stored. Needs a cache shared by every process (Redis).
+    """
+
+    def __init__(self, cache=cache):
+        self.cache = cache
+
+    def _keys(self, user_id):
+        return f"otp:{user_id}", f"otp:{user_id}:attempts"
+
+    def _digest(self, code):
+        return hmac.new(settings.SECRET_KEY.encode(), str(code).encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, user_id):
+        code = generate()
+        code_key, attempts_key = self._keys(user_id)
+        self.cache.set_many({code_key: self._digest(code), attempts_key: 0}, ttl())
+        return code
+
+    def verify(self, user_id, code):
+        code_key, attempts_key = self._keys(user_id)
+        stored = self.cache.get(code_key)
+        if stored is None:
+            return MISSING
+        try:
+            attempts = self.cache.incr(attempts_key)
+        except ValueError:  # attempts entry evicted: count from here
+            self.cache.add(attempts_key, 1, ttl())
+            attempts = 1
+        if attempts > max_attempts():
+            self.cache.delete_many([code_key, attempts_key])
+            return LOCKED
+        if not hmac.compare_digest(stored, self._digest(code)):
+            return INVALID
+        self.cache.delete_many([code_key, attempts_key])  # single use
+        return VALID
+
+    def discard(self, user_id):
+        self.cache.delete_many(list(self._keys(user_id)))
+
+
+class ModelOTPStore:
+    """The PasswordResetOTP table, for deployments without a shared cache."""
+
+    def issue(self, user_id):
+        code = generate()
+        PasswordResetOTP.objects.update_or_create(
+            user_id=user_id, defaults={"otp": code, "created_at": timezone.now(), "attempts": 0}
+        )
+        return code
+
+    def verify(self, user_id, code):
+        # the attempt is counted in the same UPDATE that finds the row
+        if not PasswordResetOTP.objects.filter(user_id=user_id).update(attempts=F("attempts") + 1):
+            return MISSING
+        record = PasswordResetOTP.objects.get(user_id=user_id)
+        if record.is_expired(minutes=ttl() / 60):
+            return EXPIRED
+        if record.attempts > max_attempts():
+            record.delete()
+            return LOCKED
+        if not hmac.compare_digest(record.otp, str(code)):
+            return INVALID
+        record.delete()  # single use
+        return VALID
+
+    def discard(self, user_id):
+        PasswordResetOTP.objects.filter(user_id=user_id).delete()
+
+
+def get_store():
+    return import_string(_setting("OTP_STORE", DEFAULT_STORE))()
+
+
+def issue(user_id):
+    """A fresh code for ``user_id``, replacing any earlier one."""
+    return get_store().issue(user_id)
+
+
+def verify(user_id, code):
+    """
+    Check ``code``; one of VALID, INVALID, MISSING, EXPIRED or LOCKED (too
+    many wrong guesses). A VALID code is used up, so it can't be replayed.
+    """
+    return get_store().verify(user_id, code)
+
+
+def discard(user_id):
+    get_store().discard(user_id)
+
+
+def purge_expired(chunk_size=PURGE_CHUNK):
+    """
+    Delete PasswordResetOTP rows past the TTL, a chunk of ids per DELETE so
+    the table isn't locked for long. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=ttl())
+    deleted = 0
+    while True:
+        ids = list(
+            PasswordResetOTP.objects.filter(created_at__lt=cutoff)
+            .order_by("id").values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += PasswordResetOTP.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,104 @@
+import traceback
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from . import jobs
+from .models import OutgoingEmail
+
+
+BATCH_SIZE = 50
+LOCK_TIMEOUT = 300      # a batch "sending" longer than this is assumed to have lost its sender
+SEND_TASK = "outbox.send"   # registered in tasks.py; run by `manage.py run_workers`
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """
+    Put a message in the outbox and queue a job to send it. Both rows are
+    written in the caller's transaction, so nothing is sent for a request
+    that rolls back, and the request never waits on SMTP. Whichever send
+    job runs first takes everything due, so the rest find nothing to do.
+    """
+    email = OutgoingEmail.objects.create(
+        subject=subject, body=message, to=list(recipient_list),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+    jobs.enqueue(SEND_TASK)
+    return email
+
+
+def claim(batch_size=BATCH_SIZE):
+    """Take up to ``batch_size`` due messages (SKIP LOCKED, so senders never share one)."""
+    return jobs.claim_rows(OutgoingEmail, "send_after", OutgoingEmail.SENDING, batch_size)
+
+
+def requeue_stale():
+    """Put mail whose sender died mid-batch back in the queue (it may go out twice)."""
+    return jobs.requeue_rows(
+        OutgoingEmail, OutgoingEmail.SENDING, getattr(settings, "OUTBOX_LOCK_TIMEOUT", LOCK_TIMEOUT)
+    )
+
+
+def _failed(message, error):
+    state, send_after = jobs.retry_or_fail(message, "send_after", error)
+    if state == OutgoingEmail.QUEUED:
+        jobs.enqueue(SEND_TASK, run_at=send_after)
+
+
+def send_batch(batch):
+    """
+    Send claimed messages over a single connection: one SMTP handshake
+    (and TLS negotiation, login) per batch instead of per message. A
+    message the server refuses is retried on its own with backoff; the
+    rest of the batch still goes out. Returns the number sent.
+    """
+    if not batch:
+        return 0
+    connection = get_connection(fail_silently=False)
+    sent = []
+    try:
+        connection.open()
+    except Exception:
+        error = traceback.format_exc()
+        for message in batch:
+            _failed(message, error)
+        return 0
+    try:
+        for message in batch:
+            email = EmailMessage(message.subject, message.body, message.from_email, message.to,
+                                 connection=connection)
+            try:
+                connection.send_messages([email])
+            except Exception:
+                _failed(message, traceback.format_exc())
+                # the session may be broken (disconnect, timeout): start a fresh one
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass  # send_messages reopens on its own, or fails the next message
+            else:
+                sent.append(message.pk)
+    finally:
+        connection.close()
+        OutgoingEmail.objects.filter(pk__in=sent).update(
+            state=OutgoingEmail.SENT, locked_at=None, sent_at=timezone.now(), last_error=""
+        )
+    return len(sent)
+
+
+def deliver(batch_size=BATCH_SIZE):
+    """Claim and send one batch; returns the number sent."""
+    return send_batch(claim(batch_size))
+
+
+def flush(batch_size=BATCH_SIZE):
+    """Send everything due, batch by batch; the SEND_TASK job. Returns messages sent."""
+    requeue_stale()
+    sent = 0
+    while True:
+        batch = claim(batch_size)
+        if not batch:
+            return sent
+        sent += send_batch(batch)
@@ -0,0 +1,86 @@
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+    if created_at is None:
+        raise InvalidCursor(token)
+    return created_at, pk
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value in (None, ""):
+        return default
+    size = int(value)  # ValueError is handled by the caller
+    if size < 1:
+        raise ValueError(value)
+    return min(size, maximum)
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, field="created_at"):
+    """
+    Newest-first page of ``queryset`` ordered on (field, id).
+
+    Seeks past ``cursor`` instead of using OFFSET, so every page costs the
+    same index range scan no matter how deep the client has paged.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk})
+        )
+    rows = list(queryset.order_by(f"-{field}", "-id")[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        value = last[field] if isinstance(last, dict) else getattr(last, field)
+        last_pk = last["id"] if isinstance(last, dict) else last.pk
+        next_cursor = encode_cursor(value, last_pk)
+    return rows, next_cursor
+
+
+def estimate_count(queryset):
+    """
+    Approximate row count for ``queryset`` without running COUNT(*).
+
+    On PostgreSQL this is the planner's row estimate (pg_class.reltuples
+    scaled by the selectivity of the WHERE clause), read from EXPLAIN; it
+    is cheap but can be off until the table is next ANALYZEd. Other
+    backends fall back to an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,87 @@
+class InvalidFields(ValueError):
+    pass
+
+
+class Projection:
+    """
+    Maps the public field names an endpoint accepts in ``?fields=`` (or a
+    named preset) to the DB columns that have to be selected for them, so
+    list views can hand ``.values()``/``.only()`` exactly those columns.
+    """
+
+    def __init__(self, columns, presets, default="full", formatters=None):
+        # public name -> column / lookup path, or None for parts the view
+        # assembles itself
+        self.columns = columns
+        self.presets = presets  # preset name -> tuple of public names
+        self.default = default
+        self.formatters = formatters or {}
+
+    def parse(self, value):
+        value = (value or "").strip() or self.default
+        if value in self.presets:
+            return self.presets[value]
+        names = tuple(dict.fromkeys(n.strip() for n in value.split(",") if n.strip()))
+        unknown = [n for n in names if n not in self.columns]
+        if unknown or not names:
+            raise InvalidFields(", ".join(unknown) or value)
+        return names
+
+    def select(self, names, *extra):
+        """Columns to fetch for ``names`` plus any the caller needs itself (keys, cursors)."""
+        columns = [self.columns[n] for n in names if self.columns[n] is not None]
+        return list(dict.fromkeys([*columns, *extra]))
+
+    def render(self, row, names):
+        out = {}
+        for name in names:
+            column = self.columns[name]
+            if column is None:
+                continue  # assembled by the caller
+            value = row[column] if isinstance(row, dict) else getattr(row, column)
+            formatter = self.formatters.get(name)
+            out[name] = formatter(value) if formatter else value
+        return out
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+PRODUCTS = Projection(
+    columns={
+        name: name for name in
+        ("id", "sku", "name", "description", "price", "stock", "category", "image")
+    },
+    presets={
+        "card": ("id", "name", "price", "image"),
+        "full": ("id", "sku", "name", "description", "price", "stock", "category", "image"),
+    },
+    formatters={"price": _float, "image": lambda v: v or ""},
+)
+
+ORDERS = Projection(
+    columns={
+        "order_id": "id",
+        "user": "user__username",
+        "total_amount": "total_amount",
+        "status": "status",
+        "created_at": "created_at",
+    },
+    presets={
+        "summary": ("order_id", "status", "total_amount", "created_at"),
+        "full": ("order_id", "user", "total_amount", "status", "created_at"),
+    },
+    formatters={"total_amount": _float},
+)
+
+# Order detail: the nested parts cost a join / a query of their own, so
+# they're only loaded when asked for.
+ORDER_DETAIL = Projection(
+    columns={**ORDERS.columns, "shipping_address": None, "items": None},
+    presets={
+        "summary": ORDERS.presets["summary"],
+        "full": (*ORDERS.presets["full"], "shipping_address", "items"),
+    },
+    formatters={"total_amount": _float},
+)
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import math
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+
+logger = logging.getLogger(__name__)
+
+# {scope: {dimension: "count/window"}}; dimensions are "ip" or a request
+# field. Override with settings.RATE_LIMITS.
+DEFAULT_LIMITS = {
+    "login": {"ip": "20/m", "username": "10/m"},
+    "forget_password": {"ip": "10/m", "email": "3/15m"},
+    "verify_otp": {"ip": "20/m", "email": "5/15m"},
+}
+DEFAULT_BACKEND = "ecommerce_app.ratelimit.SlidingWindowCounter"
+REJECTED_KEY = "ratelimit:rejected:{}:{}"
+
+_RATE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def parse_rate(rate):
+    """Parse "5/m", "3/15m", "100/h"... into (limit, window_seconds)."""
+    match = _RATE.match(rate.replace(" ", ""))
+    if not match:
+        raise ValueError(f"Bad rate {rate!r}; expected e.g. '5/m' or '3/15m'.")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * _UNITS[unit]
+
+
+class SlidingWindowCounter:
+    """
+    Sliding-window limit from two fixed-window counters in the cache: the
+    previous window's count is weighted by how much of it still overlaps
+    the sliding window. Two small keys per client, atomic increments, and
+    no burst at window edges the way a plain fixed window allows.
+    """
+
+    def __init__(self, cache=cache):
+        self.cache = cache
+
+    def hit(self, key, limit, window):
+        """Count one attempt; 0 if it's within ``limit``, else seconds to wait."""
+        now = time.time()
+        index, elapsed = divmod(now, window)
+        current_key, previous_key = f"ratelimit:{key}:{int(index)}", f"ratelimit:{key}:{int(index) - 1}"
+        # rejected attempts count too, so a client that keeps hammering stays blocked
+        if self.cache.add(current_key, 1, timeout=2 * window):
+            current = 1
+        else:
+            try:
+                current = self.cache.incr(current_key)
+            except ValueError:  # expired in between
+                self.cache.add(current_key, 1, timeout=2 * window)
+                current = 1
+        previous = self.cache.get(previous_key, 0)
+        overlap = (window - elapsed) / window
+        if previous * overlap + current <= limit:
+            return 0
+        if current > limit:
+            return max(1, math.ceil(window - elapsed))
+        # wait until enough of the previous window has slid out
+        excess = previous * overlap + current - limit
+        return max(1, math.ceil(excess * window / previous))
+
+
+def backend():
+    return import_string(_setting("RATE_LIMIT_BACKEND", DEFAULT_BACKEND))()
+
+
+def client_ip(request):
+    # behind a proxy, set RATE_LIMIT_IP_HEADER (e.g. "HTTP_X_FORWARDED_FOR");
+    # the last entry is the one our own proxy appended, so it can't be spoofed
+    header = _setting("RATE_LIMIT_IP_HEADER", None)
+    if header and request.META.get(header):
+        return request.META[header].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _identity(request, dimension):
+    if dimension == "ip":
+        return client_ip(request)
+    value = request.data.get(dimension)
+    return str(value).strip().lower() if value else None
+
+
+def _record_rejection(scope, dimension):
+    key = REJECTED_KEY.format(scope, dimension)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def rejections():
+    """Rejected requests so far, as {scope: {dimension: n}} (shared across processes)."""
+    limits = _setting("RATE_LIMITS", DEFAULT_LIMITS)
+    counts = cache.get_many([REJECTED_KEY.format(s, d) for s, rules in limits.items() for d in rules])
+    return {
+        scope: {dimension: counts.get(REJECTED_KEY.format(scope, dimension), 0) for dimension in rules}
+        for scope, rules in limits.items()
+    }
+
+
+def reset_rejections():
+    limits = _setting("RATE_LIMITS", DEFAULT_LIMITS)
+    cache.delete_many([REJECTED_KEY.format(s, d) for s, rules in limits.items() for d in rules])
+
+
+def rate_limited(scope):
+    """
+    Apply the RATE_LIMITS rules for ``scope`` to an APIView method. Every
+    request counts against each of its identities (client IP, username,
+    email...); if any is over its rate the request gets a 429 with
+    Retry-After before the handler runs, so a credential-stuffing burst
+    costs cache increments rather than password hashes and DB writes.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if not _setting("RATE_LIMIT_ENABLED", True):
+                return method(view, request, *args, **kwargs)
+            limiter = backend()
+            wait, exceeded = 0, []
+            for dimension, rate in _setting("RATE_LIMITS", DEFAULT_LIMITS).get(scope, {}).items():
+                identity = _identity(request, dimension)
+                if not identity:
+                    continue
+                limit, window = parse_rate(rate)
+                digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+                retry_after = limiter.hit(f"{scope}:{dimension}:{digest}", limit, window)
+                if retry_after:
+                    wait = max(wait, retry_after)
+                    exceeded.append(dimension)
+            if not exceeded:
+                return method(view, request, *args, **kwargs)
+
+            for dimension in exceeded:
+                _record_rejection(scope, dimension)
+            logger.warning("Rate limit hit on %s by %s (%s)", scope, client_ip(request), ", ".join(exceeded))
+            response = Response(
+                {"error": "Too many attempts. Please try again later."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            response["Retry-After"] = str(wait)
+            return response
+        return wrapper
+    return decorator
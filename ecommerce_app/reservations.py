@@ -0,0 +1,119 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product, Reservation
+
+
+SWEEP_BATCH = 1000
+
+
+class Unavailable(Exception):
+    def __init__(self, available):
+        super().__init__(available)
+        self.available = available
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, "CART_RESERVATION_TTL", 900))
+
+
+def _per_product(amounts):
+    return Case(
+        *(When(pk=pk, then=Value(n)) for pk, n in amounts.items()),
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def unreserve(amounts):
+    """Take ``amounts`` ({product_id: units}) off Product.reserved in one UPDATE."""
+    amounts = {pk: n for pk, n in amounts.items() if n}
+    if amounts:
+        Product.objects.filter(pk__in=list(amounts)).update(reserved=F("reserved") - _per_product(amounts))
+
+
+def hold(user, product_id, quantity):
+    """
+    Make ``user``'s hold on a product exactly ``quantity`` units (their
+    cart line) and restart its TTL. Growing a hold is a conditional
+    UPDATE on the reserved counter, WHERE stock - reserved >= extra, so
+    two carts can never hold the same unit. Raises Unavailable.
+    """
+    expires_at = timezone.now() + _ttl()
+    with transaction.atomic():
+        current = (
+            Reservation.objects.select_for_update()
+            .filter(user_id=user.pk, product_id=product_id).first()
+        )
+        held = current.quantity if current else 0  # expired-but-unswept holds are still counted
+        extra = quantity - held
+        if extra > 0:
+            taken = Product.objects.filter(pk=product_id, stock__gte=F("reserved") + extra).update(
+                reserved=F("reserved") + extra
+            )
+            if not taken and release_expired([product_id], keep=current.pk if current else None):
+                taken = Product.objects.filter(pk=product_id, stock__gte=F("reserved") + extra).update(
+                    reserved=F("reserved") + extra
+                )
+            if not taken:
+                product = Product.objects.filter(pk=product_id).values("stock", "reserved").first()
+                available = max(product["stock"] - product["reserved"], 0) if product else 0
+                raise Unavailable(available + held)
+        elif extra < 0:
+            unreserve({product_id: -extra})
+
+        if current:
+            current.quantity, current.expires_at = quantity, expires_at
+            current.save(update_fields=["quantity", "expires_at"])
+        else:
+            current = Reservation.objects.create(
+                user_id=user.pk, product_id=product_id, quantity=quantity, expires_at=expires_at
+            )
+    return current
+
+
+def release(user, product_ids=None):
+    """Drop ``user``'s holds (all of them, or just on ``product_ids``)."""
+    with transaction.atomic():
+        holds = Reservation.objects.select_for_update().filter(user_id=user.pk)
+        if product_ids is not None:
+            holds = holds.filter(product_id__in=product_ids)
+        holds = list(holds.values_list("id", "product_id", "quantity"))
+        if holds:
+            unreserve(Counter({product_id: qty for _, product_id, qty in holds}))
+            Reservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+    return {product_id: qty for _, product_id, qty in holds}
+
+
+def release_expired(product_ids=None, batch_size=SWEEP_BATCH, keep=None):
+    """
+    Sweep expired holds in batches: each batch is one indexed range read
+    on expires_at, one CASE UPDATE of the counters and one DELETE.
+    SKIP LOCKED leaves holds that a cart is renewing right now alone
+    (as does ``keep``, for the caller's own). Returns the number released.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = Reservation.objects.select_for_update(skip_locked=True).filter(
+                expires_at__lte=timezone.now()
+            )
+            if product_ids is not None:
+                expired = expired.filter(product_id__in=product_ids)
+            if keep is not None:
+                expired = expired.exclude(pk=keep)
+            batch = list(expired.order_by("expires_at").values_list("id", "product_id", "quantity")[:batch_size])
+            if not batch:
+                return released
+            amounts = Counter()
+            for _, product_id, qty in batch:
+                amounts[product_id] += qty
+            unreserve(amounts)
+            Reservation.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+        released += len(batch)
+        if len(batch) < batch_size:
+            return released
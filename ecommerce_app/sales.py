@@ -0,0 +1,248 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archive, exports
+from .catalog import InvalidFilter
+from .models import ArchivedOrder, OrderItem, Product, SalesOrderCount, SalesRollup
+from .orders import STATUSES, parse_iso_date
+
+
+logger = logging.getLogger(__name__)
+
+GROUP_FIELDS = ("day", "category", "status")
+DEFAULT_DAYS = 30
+# category of the delta that counts the order itself (SalesOrderCount)
+WHOLE_ORDER = None
+
+
+def _zero():
+    return [0, 0, Decimal("0.00")]  # orders, units, revenue
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def order_lines(order_id):
+    """{category: (units, revenue)} for one order, from its items."""
+    rows = (
+        OrderItem.objects.filter(order_id=order_id).order_by()
+        .values_list("product__category")
+        .annotate(units=Sum("quantity"), revenue=Sum("subtotal"))
+    )
+    return {category or "": (units, revenue) for category, units, revenue in rows}
+
+
+def contribution(day, status, lines, sign=1):
+    """
+    Rollup deltas for one order: it counts once in every category it has
+    items in, and once under WHOLE_ORDER for the distinct order count.
+    """
+    deltas = defaultdict(_zero)
+    for category, (units, revenue) in lines.items():
+        delta = deltas[(day, category or "", status)]
+        delta[0] += sign
+        delta[1] += sign * units
+        delta[2] += sign * revenue
+    if lines:
+        deltas[(day, WHOLE_ORDER, status)][0] += sign
+    return deltas
+
+
+def _upsert(model, keys, counters, rows):
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ", ".join(qn(c) for c in (*keys, *counters))
+    values = ", ".join([f"({', '.join(['%s'] * (len(keys) + len(counters)))})"] * len(rows))
+    updates = ", ".join(f"{qn(c)} = {table}.{qn(c)} + excluded.{qn(c)}" for c in counters)
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES {values} "
+        f"ON CONFLICT ({', '.join(qn(c) for c in keys)}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def apply_deltas(deltas):
+    """
+    Add {(day, category, status): [orders, units, revenue]} to the rollup
+    with one INSERT ... ON CONFLICT DO UPDATE per table, so a checkout
+    costs two statements however many categories it touches. Runs in the
+    caller's transaction so totals commit with the orders.
+    """
+    rows = [(*key, *delta) for key, delta in deltas.items() if any(delta)]
+    by_category = [row for row in rows if row[1] is not WHOLE_ORDER]
+    by_order = [(day, status, orders) for day, category, status, orders, _, _ in rows if category is WHOLE_ORDER]
+    if by_category:
+        _upsert(SalesRollup, GROUP_FIELDS, ("orders", "units", "revenue"), by_category)
+    if by_order:
+        _upsert(SalesOrderCount, ("day", "status"), ("orders",), by_order)
+
+
+def record_order(order, lines):
+    apply_deltas(contribution(order_day(order), order.status, lines))
+
+
+def record_status_change(order, before, lines=None):
+    """Move an order's totals from status ``before`` to its current status."""
+    if before == order.status:
+        return
+    lines = order_lines(order.pk) if lines is None else lines
+    deltas = contribution(order_day(order), before, lines, sign=-1)
+    for key, delta in contribution(order_day(order), order.status, lines).items():
+        deltas[key] = [a + b for a, b in zip(deltas[key], delta)]
+    apply_deltas(deltas)
+
+
+def remove_order(order, lines=None):
+    lines = order_lines(order.pk) if lines is None else lines
+    apply_deltas(contribution(order_day(order), order.status, lines, sign=-1))
+
+
+def _add_archived(totals, order_counts, chunk_size):
+    """
+    Add orders archive_orders moved out of OrderItem, from the export rows
+    kept in their archive records. Categories are looked up the same way
+    as for live items: the product's current category.
+    """
+    records = archive.iter_records(ArchivedOrder.objects.all())
+    skipped = 0
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            return skipped
+        skipped += sum("lines" not in record for record in batch)
+        lines = [
+            dict(zip(exports.ORDER_LINE_FIELDS, exports.archived_line(values)))
+            for record in batch for values in record.get("lines", ())
+        ]
+        categories = dict(
+            Product.objects.filter(pk__in={line["product_id"] for line in lines}).values_list("id", "category")
+        )
+        counted = set()
+        for line in lines:
+            day, status = timezone.localdate(line["order_created_at"]), line["status"]
+            category = categories.get(line["product_id"]) or ""
+            total = totals[(day, category, status)]
+            if (line["order_id"], category) not in counted:
+                counted.add((line["order_id"], category))
+                total[0] += 1
+            total[1] += line["quantity"]
+            total[2] += line["subtotal"]
+            if line["order_id"] not in counted:
+                counted.add(line["order_id"])
+                order_counts[(day, status)] += 1
+
+
+def rebuild(chunk_size=5000):
+    """
+    Recompute the rollup from order history, reading OrderItem in order-id
+    chunks so no single query scans the whole table, plus the archived
+    orders. Totals are swapped in with one transaction at the end; orders
+    placed while it runs may need another pass.
+    """
+    items = OrderItem.objects.order_by()
+    bounds = items.aggregate(lo=Min("order_id"), hi=Max("order_id"))
+    totals, order_counts = defaultdict(_zero), defaultdict(int)
+    if bounds["lo"] is not None:
+        tz = timezone.get_current_timezone()
+        created_day = TruncDate("order__created_at", tzinfo=tz)
+        for start in range(bounds["lo"], bounds["hi"] + 1, chunk_size):
+            chunk = items.filter(order_id__gte=start, order_id__lt=start + chunk_size)
+            rows = (
+                chunk.values_list(created_day, "product__category", "order__status")
+                .annotate(Count("order_id", distinct=True), Sum("quantity"), Sum("subtotal"))
+            )
+            # chunks split on order id, so per-chunk distinct order counts add up
+            for day, category, status, orders, units, revenue in rows:
+                total = totals[(day, category or "", status)]
+                total[0] += orders
+                total[1] += units
+                total[2] += revenue
+            for day, status, orders in chunk.values_list(created_day, "order__status").annotate(
+                Count("order_id", distinct=True)
+            ):
+                order_counts[(day, status)] += orders
+
+    skipped = _add_archived(totals, order_counts, chunk_size)
+    if skipped:
+        logger.warning("%s archived orders have no stored lines and are left out of the rollup", skipped)
+
+    with transaction.atomic():
+        SalesRollup.objects.all().delete()
+        SalesRollup.objects.bulk_create(
+            SalesRollup(day=d, category=c, status=s, orders=o, units=u, revenue=r)
+            for (d, c, s), (o, u, r) in totals.items()
+        )
+        SalesOrderCount.objects.all().delete()
+        SalesOrderCount.objects.bulk_create(
+            SalesOrderCount(day=d, status=s, orders=n) for (d, s), n in order_counts.items()
+        )
+    return len(totals)
+
+
+def report(params):
+    """
+    Sales totals from the rollup for ?date_from/?date_to (inclusive,
+    default the last 30 days), optionally filtered by ?category and
+    ?status (comma-separated) and grouped by any of ?group_by=day,category,status.
+    With a category in play ``orders`` counts the orders with items in it;
+    otherwise each order counts once. Raises InvalidFilter on bad input.
+    """
+    date_to = parse_iso_date(params.get("date_to")) or timezone.localdate()
+    date_from = parse_iso_date(params.get("date_from")) or date_to - timedelta(days=DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise InvalidFilter(params.get("date_from"))
+
+    group_by = [g for g in params.get("group_by", "day").split(",") if g]
+    if any(g not in GROUP_FIELDS for g in group_by):
+        raise InvalidFilter(params.get("group_by"))
+    group_by = list(dict.fromkeys(group_by))
+
+    qs = SalesRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+    category = params.get("category")
+    if category is not None:
+        qs = qs.filter(category=category)
+    statuses = [s for s in params.get("status", "").split(",") if s]
+    if any(s not in STATUSES for s in statuses):
+        raise InvalidFilter(params.get("status"))
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+
+    totals = dict(orders=Sum("orders"), units=Sum("units"), revenue=Sum("revenue"))
+    if group_by:
+        rows = [
+            row for row in qs.order_by(*group_by).values(*group_by).annotate(**totals)
+            if row["orders"] or row["units"]
+        ]
+    else:
+        rows = [{k: v or 0 for k, v in qs.aggregate(**totals).items()}]
+
+    if "category" not in group_by and category is None:
+        # summed over categories, an order with items in two would count twice
+        counts = SalesOrderCount.objects.filter(day__gte=date_from, day__lte=date_to)
+        if statuses:
+            counts = counts.filter(status__in=statuses)
+        if group_by:
+            orders = {
+                tuple(row[g] for g in group_by): row["orders"]
+                for row in counts.order_by().values(*group_by).annotate(orders=Sum("orders"))
+            }
+            for row in rows:
+                row["orders"] = orders.get(tuple(row[g] for g in group_by), 0)
+        else:
+            rows[0]["orders"] = counts.aggregate(orders=Sum("orders"))["orders"] or 0
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "group_by": group_by,
+        "rows": [{**row, "revenue": float(row["revenue"])} for row in rows],
+    }
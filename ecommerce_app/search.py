@@ -0,0 +1,226 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import F
+
+from .models import Product
+
+
+# Field weights: a hit in the name outranks one in the category, which
+# outranks one buried in the description.
+WEIGHTS = {"name": "A", "category": "B", "description": "C"}
+WEIGHT_SCORES = {"A": 1.0, "B": 0.4, "C": 0.2}
+TRIGRAM_THRESHOLD = 0.3
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+SEARCH_VECTOR = (
+    SearchVector("name", weight="A", config="english")
+    + SearchVector("category", weight="B", config="english")
+    + SearchVector("description", weight="C", config="english")
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with".split()
+)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOP_WORDS]
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a, b):
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+class PostgresSearchBackend:
+    """
+    Full-text search over the maintained ``Product.search_vector`` column
+    (GIN indexed), falling back to pg_trgm similarity on the name when the
+    query has no lexeme matches, e.g. because of a typo.
+    """
+
+    def index_products(self, product_ids):
+        Product.objects.filter(pk__in=product_ids).update(search_vector=SEARCH_VECTOR)
+
+    def remove_products(self, product_ids):
+        pass  # the row, and with it the vector, is already gone
+
+    def rebuild(self):
+        Product.objects.update(search_vector=SEARCH_VECTOR)
+
+    def search(self, query, limit=DEFAULT_LIMIT, queryset=None):
+        qs = Product.objects.filter(is_active=True) if queryset is None else queryset
+        ts_query = SearchQuery(query, search_type="websearch", config="english")
+        ranked = list(
+            qs.filter(search_vector=ts_query)
+            .annotate(rank=SearchRank(F("search_vector"), ts_query))
+            .order_by("-rank", "-id")[:limit]
+        )
+        if ranked:
+            return ranked
+        return list(
+            qs.annotate(rank=TrigramSimilarity("name", query))
+            .filter(rank__gt=TRIGRAM_THRESHOLD)
+            .order_by("-rank", "-id")[:limit]
+        )
+
+
+class InvertedIndexSearchBackend:
+    """
+    In-process inverted index used when the database has no full-text
+    support (SQLite dev/test runs). Built lazily on first search and kept
+    current by index_products/remove_products. Each process holds its own
+    copy, so it is not meant for multi-worker production use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._postings = defaultdict(dict)   # term -> {product_id: score}
+        self._doc_terms = {}                 # product_id -> set(terms)
+        self._trigram_terms = defaultdict(set)  # trigram -> set(terms)
+
+    def _add(self, pk, name, category, description):
+        scores = defaultdict(float)
+        for field, text in (("name", name), ("category", category), ("description", description)):
+            for term in tokenize(text):
+                scores[term] += WEIGHT_SCORES[WEIGHTS[field]]
+        self._doc_terms[pk] = set(scores)
+        for term, score in scores.items():
+            if term not in self._postings:
+                for gram in trigrams(term):
+                    self._trigram_terms[gram].add(term)
+            self._postings[term][pk] = score
+
+    def _discard(self, pk):
+        for term in self._doc_terms.pop(pk, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(pk, None)
+            if not postings:
+                del self._postings[term]
+                for gram in trigrams(term):
+                    self._trigram_terms[gram].discard(term)
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if self._built:
+                return
+            rows = Product.objects.values_list("id", "name", "category", "description")
+            for pk, name, category, description in rows.iterator(chunk_size=2000):
+                self._add(pk, name, category, description)
+            self._built = True
+
+    def index_products(self, product_ids):
+        if not self._built:
+            return  # picked up by the lazy build
+        rows = Product.objects.filter(pk__in=product_ids).values_list(
+            "id", "name", "category", "description"
+        )
+        with self._lock:
+            for pk, name, category, description in rows:
+                self._discard(pk)
+                self._add(pk, name, category, description)
+
+    def remove_products(self, product_ids):
+        with self._lock:
+            for pk in product_ids:
+                self._discard(pk)
+
+    def rebuild(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._trigram_terms.clear()
+            self._built = False
+        self._ensure_built()
+
+    def _expand(self, term):
+        # Exact term first; otherwise the closest vocabulary terms by trigram
+        # similarity, discounted by how far off they are.
+        if term in self._postings:
+            return [(term, 1.0)]
+        candidates = set()
+        for gram in trigrams(term):
+            candidates |= self._trigram_terms.get(gram, set())
+        matches = []
+        for candidate in candidates:
+            sim = trigram_similarity(term, candidate)
+            if sim >= TRIGRAM_THRESHOLD:
+                matches.append((candidate, sim))
+        return matches
+
+    def search(self, query, limit=DEFAULT_LIMIT, queryset=None):
+        self._ensure_built()
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for match, weight in self._expand(term):
+                    for pk, score in self._postings[match].items():
+                        term_scores[pk] = max(term_scores[pk], score * weight)
+                # every query term has to match (AND semantics, like websearch)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pk: s + term_scores[pk] for pk, s in scores.items() if pk in term_scores}
+                if not scores:
+                    return []
+
+        qs = Product.objects.filter(is_active=True) if queryset is None else queryset
+        # over-fetch ids so inactive products filtered out below don't starve the page
+        ranked_ids = sorted(scores, key=lambda pk: (-scores[pk], -pk))[: limit * 4]
+        products = qs.in_bulk(ranked_ids)
+        results = []
+        for pk in ranked_ids:
+            product = products.get(pk)
+            if product is not None:
+                product.rank = scores[pk]
+                results.append(product)
+                if len(results) == limit:
+                    break
+        return results
+
+
+_backends = {}
+
+
+def get_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == "postgresql":
+            _backends[vendor] = PostgresSearchBackend()
+        else:
+            _backends[vendor] = InvertedIndexSearchBackend()
+    return _backends[vendor]
+
+
+def search_products(query, limit=DEFAULT_LIMIT, queryset=None):
+    return get_backend().search(query, limit=limit, queryset=queryset)
+
+
+def index_products(product_ids):
+    get_backend().index_products(list(product_ids))
+
+
+def remove_products(product_ids):
+    get_backend().remove_products(list(product_ids))
@@ -0,0 +1,97 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import archive, catalog_cache, facets, notifications, reservations, sales, search, users
+from .models import Notification, Order, Product
+
+
+# Keep derived product data (search index, catalog cache, facet counts) in step with every write,
+# whether it comes from the API views, the admin or a shell.
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    instance._facet_key_before = facets.stored_key(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    pk = instance.pk
+    before, after = getattr(instance, "_facet_key_before", None), facets.product_key(instance)
+    if before != after:
+        facets.record_change(before, after)
+    transaction.on_commit(lambda: search.index_products([pk]))
+    transaction.on_commit(lambda: catalog_cache.invalidate_product(pk))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    facets.record_change(facets.product_key(instance), None)
+    transaction.on_commit(lambda: search.remove_products([pk]))
+    transaction.on_commit(lambda: catalog_cache.invalidate_product(pk))
+
+
+# Sales rollup: checkout.place_order records new orders (their items don't exist yet at
+# post_save); status changes and deletes are picked up here.
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, **kwargs):
+    instance._status_before = (
+        Order.objects.filter(pk=instance.pk).values_list("status", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, "_status_before", None)
+    if not created and before is not None and before != instance.status:
+        sales.record_status_change(instance, before)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    if not archive.in_progress.get():  # archived orders still count in the reports
+        sales.remove_order(instance)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # the cascade would drop the rows without giving the units back
+    reservations.release(instance)
+
+
+# Shared user resolver (users.by_id / users.by_email): drop the entries now, and again once the
+# write commits in case a concurrent request re-cached the old row in between.
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return  # login bookkeeping; not part of the record
+    pk, email = instance.pk, instance.email
+    users.invalidate(pk, email)
+    transaction.on_commit(lambda: users.invalidate(pk, email))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    pk, email = instance.pk, instance.email
+    users.invalidate(pk, email)
+    transaction.on_commit(lambda: users.invalidate(pk, email))
+
+
+# Unread notification counter (notifications.unread_count); notifications.mark_read adjusts it itself.
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    if created:
+        notifications.adjust_unread(instance.user_id, 0 if instance.is_read else 1)
+    else:
+        notifications.forget_unread(instance.user_id)  # may have flipped is_read; recount
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        notifications.adjust_unread(instance.user_id, -1)
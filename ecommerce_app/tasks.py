@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.mail import send_mail
+
+from . import outbox
+from .jobs import task
+
+
+# Handlers for ecommerce_app.jobs; imported in apps.ready() so workers know every name.
+
+@task()
+def send_email(subject, message, recipient_list, from_email=None):
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list=recipient_list,
+        fail_silently=False,
+    )
+
+
+@task(name=outbox.SEND_TASK)
+def send_outbox():
+    outbox.flush()
@@ -1,3 +1,1308 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import smtplib
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    catalog_cache, checkout, exports, facets, jobs, notifications, orders, otp_store, outbox, ratelimit, sales, search,
+    tasks, users,
+)
+from .models import (
+    Address, ArchivedOrder, Cart, IdempotencyKey, Job, Notification, Order, OrderItem, OutgoingEmail, Product,
+    ProductFacetCount, PasswordResetOTP, Reservation, SalesRollup,
+)
+
+
+class ViewAllProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(7):
+            Product.objects.create(
+                name=f"Phone {i}", price=Decimal(100 + i), category="Electronics", stock=i % 3,
+            )
+        Product.objects.create(name="Shirt", price=Decimal("20.00"), category="Fashion", stock=5)
+        Product.objects.create(name="Old Shirt", price=Decimal("5.00"), category="Fashion", stock=5,
+                               is_active=False)
+
+    def test_cursor_walks_every_product_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            res = self.client.get("/api/view_all_products/", params)
+            self.assertEqual(res.status_code, 200)
+            self.assertLessEqual(len(res.data["products"]), 2)
+            seen += [p["id"] for p in res.data["products"]]
+            cursor = res.data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(Product.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_filters(self):
+        res = self.client.get("/api/view_all_products/", {
+            "category": "Electronics", "min_price": "101", "max_price": "105", "in_stock": "true",
+        })
+        prices = sorted(p["price"] for p in res.data["products"])
+        self.assertEqual(prices, [101.0, 102.0, 104.0, 105.0])
+
+        res = self.client.get("/api/view_all_products/", {"category": "Fashion", "is_active": "true"})
+        self.assertEqual([p["name"] for p in res.data["products"]], ["Shirt"])
+
+    def test_page_size_is_bounded(self):
+        Product.objects.bulk_create(Product(name=f"Bulk {i}", price=Decimal("1.00")) for i in range(105))
+        res = self.client.get("/api/view_all_products/", {"limit": 1000})
+        self.assertEqual(len(res.data["products"]), 100)
+        self.assertIsNotNone(res.data["next_cursor"])
+
+    def test_bad_input(self):
+        self.assertEqual(self.client.get("/api/view_all_products/", {"cursor": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/view_all_products/", {"min_price": "abc"}).status_code, 400)
+        for price in ("NaN", "-Infinity"):
+            self.assertEqual(self.client.get("/api/view_all_products/", {"max_price": price}).status_code, 400)
+        self.assertEqual(self.client.get("/api/view_all_products/", {"limit": "0"}).status_code, 400)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.laptop = Product.objects.create(
+                name="Gaming Laptop", price=Decimal("900.00"), category="Electronics",
+                description="Fast laptop with a backlit keyboard",
+            )
+            self.keyboard = Product.objects.create(
+                name="Mechanical Keyboard", price=Decimal("80.00"), category="Accessories",
+                description="Pairs well with any laptop",
+            )
+            Product.objects.create(name="Hidden Laptop", price=Decimal("1.00"), is_active=False)
+        search.get_backend().rebuild()
+
+    def search(self, query):
+        res = self.client.get("/api/search_products/", {"query": query})
+        self.assertEqual(res.status_code, 200)
+        return [p["name"] for p in res.data["products"]]
+
+    def test_name_hits_rank_above_description_hits(self):
+        self.assertEqual(self.search("laptop"), ["Gaming Laptop", "Mechanical Keyboard"])
+        self.assertEqual(self.search("accessories"), ["Mechanical Keyboard"])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.search("keybord")[0], "Mechanical Keyboard")
+
+    def test_index_follows_product_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/edit_product/{self.keyboard.id}/", {"name": "Clicky Board"},
+                              format="json")
+        self.assertEqual(self.search("clicky"), ["Clicky Board"])
+        self.assertEqual(self.search("mechanical"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/delete_product/{self.laptop.id}/")
+        self.assertEqual(self.search("gaming"), [])
+
+    def test_url_pk_wins_over_body_id(self):
+        self.client.patch(f"/api/edit_product/{self.keyboard.id}/", {"id": self.laptop.id, "name": "Renamed"},
+                          format="json")
+        self.client.delete(f"/api/delete_product/{self.keyboard.id}/", {"id": self.laptop.id}, format="json")
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.name, "Gaming Laptop")
+        self.assertFalse(Product.objects.filter(pk=self.keyboard.pk).exists())
+
+    def test_query_required(self):
+        self.assertEqual(self.client.get("/api/search_products/").status_code, 400)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = Product.objects.create(name="Lamp", price=Decimal("40.00"), stock=3)
+
+    def test_catalog_page_served_from_cache_until_a_write(self):
+        self.client.get("/api/view_all_products/")
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/view_all_products/")
+        self.assertEqual(res.data["products"][0]["name"], "Lamp")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/edit_product/{self.product.id}/", {"price": "35.00"}, format="json")
+        res = self.client.get("/api/view_all_products/")
+        self.assertEqual(res.data["products"][0]["price"], 35.0)
+
+    def test_coupon_uses_cached_product(self):
+        self.client.post("/api/apply_coupon/", {"product_id": self.product.id, "coupon_code": "X"})
+        with self.assertNumQueries(0):
+            res = self.client.post("/api/apply_coupon/", {"product_id": self.product.id, "coupon_code": "X"})
+        self.assertEqual(res.data["discounted_price"], 36.0)
+
+        pk = self.product.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        res = self.client.post("/api/apply_coupon/", {"product_id": pk, "coupon_code": "X"})
+        self.assertEqual(res.status_code, 404)
+
+    def test_single_flight_recompute(self):
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"ok": True}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(catalog_cache.get_or_compute("k", slow_compute)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"ok": True}] * 8)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = Product.objects.create(name="Mug", price=Decimal("9.00"))
+        self.user = User.objects.create_user("buyer", "buyer@example.com", "pw")
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal("9.00"))
+
+    def test_catalog_not_modified(self):
+        res = self.client.get("/api/view_all_products/")
+        etag = res["ETag"]
+        res = self.client.get("/api/view_all_products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Plate", price=Decimal("4.00"))
+        res = self.client.get("/api/view_all_products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_product_list_page_not_modified(self):
+        etag = self.client.get("/ui/product_list/")["ETag"]
+        self.assertEqual(self.client.get("/ui/product_list/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_order_detail_not_modified_until_status_changes(self):
+        url = f"/api/order_detail/{self.order.id}/"
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 304)
+
+        etag = res["ETag"]
+        self.order.status = "Paid"
+        self.order.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Product.objects.create(name=f"Item, {i}", price=Decimal(f"{i}.50"), description="line\nbreak")
+
+    def test_jsonl_stream(self):
+        res = self.client.get("/api/export_catalog/")
+        self.assertTrue(res.streaming)
+        rows = [json.loads(line) for line in b"".join(res.streaming_content).decode().splitlines()]
+        self.assertEqual([r["name"] for r in rows], [f"Item, {i}" for i in range(5)])
+        self.assertEqual(rows[2]["price"], "2.50")
+
+    def test_gzipped_csv_stream(self):
+        res = self.client.get("/api/export_catalog/", {"format": "csv", "gzip": "true"})
+        self.assertEqual(res["Content-Type"], "application/gzip")
+        text = gzip.decompress(b"".join(res.streaming_content)).decode()
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["description"], "line\nbreak")
+
+    def test_bad_format(self):
+        self.assertEqual(self.client.get("/api/export_catalog/", {"format": "xml"}).status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.jsonl.gz")
+            call_command("export_catalog", output=path, gzip=True, chunk_size=2, stderr=io.StringIO())
+            with gzip.open(path, "rt") as fh:
+                self.assertEqual(len(fh.readlines()), 5)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="buyer", email="buyer@example.com")
+        address = Address.objects.create(user=user, street="1 Main", city="Pune", state="MH", zip_code="411001")
+        product = Product.objects.create(name="Lamp", price=Decimal("15.00"))
+        for n in range(1, 8):
+            order = Order.objects.create(user=user, total_amount=Decimal("15.00") * n, shipping_address=address)
+            OrderItem.objects.create(order=order, product=product, quantity=n, price_at_purchase=Decimal("15.00"))
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=60))
+
+    def export(self, out_dir):
+        call_command("export_orders", "--from", f"{timezone.now() - timedelta(days=7):%Y-%m-%d}",
+                     "--to", f"{timezone.now() + timedelta(days=1):%Y-%m-%d}", "-o", out_dir,
+                     "--workers", "1", "--shards", "3", stdout=io.StringIO())
+        with open(os.path.join(out_dir, "manifest.json")) as fh:
+            return json.load(fh)
+
+    def test_sharded_export_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            manifest = self.export(first)
+            self.assertEqual(manifest["rows"], 6)  # the 60-day-old order is out of range
+            self.assertEqual(len(manifest["shards"]), 3)
+            rows = []
+            for shard in manifest["shards"]:
+                with open(os.path.join(first, shard["file"])) as fh:
+                    rows += list(csv.DictReader(fh))
+            self.assertEqual([r["quantity"] for r in rows], [str(n) for n in range(1, 7)])
+            self.assertEqual(rows[2]["subtotal"], "45.00")
+            self.assertEqual(rows[0]["ship_city"], "Pune")
+
+            self.assertEqual(self.export(second), manifest)
+
+
+class BulkImportTests(TestCase):
+    CSV = (
+        "sku,name,price,stock,category\n"
+        "A-1,Kettle,25.00,4,Kitchen\n"
+        "A-2,Toaster,abc,1,Kitchen\n"
+        ",Spoon,1.50,,Kitchen\n"
+        "A-1,Kettle v2,27.00,6,Kitchen\n"
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def upload(self, content, name="feed.csv", **data):
+        return self.client.post("/api/import_products/", {
+            "file": SimpleUploadedFile(name, content if isinstance(content, bytes) else content.encode()), **data,
+        }, format="multipart")
+
+    def test_csv_upsert_reports_row_errors(self):
+        res = self.upload(self.CSV, batch_size=2)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.data["rows"], res.data["upserted"], res.data["failed"]), (4, 3, 1))
+        self.assertEqual(res.data["errors"], [{"row": 2, "error": "Invalid price or stock."}])
+        kettle = Product.objects.get(sku="A-1")
+        self.assertEqual((kettle.name, kettle.price, kettle.stock), ("Kettle v2", Decimal("27.00"), 6))
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_jsonl_updates_existing_sku(self):
+        Product.objects.create(sku="B-7", name="Old", price=Decimal("1.00"))
+        feed = '{"sku": "B-7", "name": "New", "price": "3.00"}\nnot json\n'
+        res = self.upload(feed, name="feed.jsonl")
+        self.assertEqual(res.data["failed"], 1)
+        self.assertEqual(Product.objects.get(sku="B-7").name, "New")
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_jsonl_values_of_the_wrong_type_are_row_errors(self):
+        feed = (
+            '{"sku": 1001, "name": "Pan", "price": 9, "category": 7}\n'
+            '{"sku": "C-2", "name": "Pot", "price": "5.00", "category": {"id": 7}}\n'
+        )
+        res = self.upload(feed, name="feed.jsonl")
+        self.assertEqual(res.data["errors"], [{"row": 2, "error": "category must be text."}])
+        self.assertEqual(Product.objects.values_list("sku", "category").get(), ("1001", "7"))
+
+    def test_bad_encoding_stops_at_its_row(self):
+        feed = b"sku,name,price\nD-1,Cup,2.00\nD-2,Caf\xe9,3.00\nD-3,Jug,4.00\n"
+        res = self.upload(feed, batch_size=1)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["errors"], [{"row": 2, "error": "Not valid UTF-8; the rest of the file was skipped."}])
+        self.assertEqual(list(Product.objects.values_list("sku", flat=True)), ["D-1"])
+
+    def test_import_refreshes_search_index(self):
+        search.get_backend().rebuild()
+        self.upload(self.CSV)
+        self.assertEqual([p.sku for p in search.search_products("kettle")], ["A-1"])
+
+    def test_add_product_shares_validation(self):
+        res = self.client.post("/api/add_product/", {"name": "X", "price": "abc"})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.post("/api/add_product/", {"name": "X", "price": "-1"})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.post("/api/add_product/", {"name": "X", "price": "1", "sku": ["a"]}, format="json")
+        self.assertEqual(res.status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "feed.csv")
+            with open(path, "w") as fh:
+                fh.write(self.CSV)
+            out = io.StringIO()
+            call_command("import_products", path, stdout=out, stderr=io.StringIO())
+        self.assertIn("3 upserted, 1 failed of 4 rows", out.getvalue())
+
+
+class BulkEditProductsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.a = Product.objects.create(name="A", price=Decimal("10.00"), stock=5)
+        self.b = Product.objects.create(name="B", price=Decimal("20.00"), stock=1)
+        self.c = Product.objects.create(name="C", price=Decimal("30.00"), stock=0)
+
+    def patch(self, updates):
+        return self.client.patch("/api/bulk_edit_products/", {"updates": updates}, format="json")
+
+    def test_mixed_batch(self):
+        res = self.patch([
+            {"id": self.a.id, "price": "12.50", "stock_delta": -2},
+            {"id": self.b.id, "stock_delta": -3},
+            {"id": self.c.id, "stock": 9, "is_active": False},
+            {"id": 999999, "price": "1.00"},
+            {"id": "x"},
+        ])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["updated"], 2)
+        self.assertEqual(res.data["results"], {
+            str(self.a.id): "ok", str(self.b.id): "insufficient_stock", str(self.c.id): "ok",
+            "999999": "not_found", "x": "invalid",
+        })
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.c.refresh_from_db()
+        self.assertEqual((self.a.price, self.a.stock), (Decimal("12.50"), 3))
+        self.assertEqual(self.b.stock, 1)
+        self.assertEqual((self.c.stock, self.c.is_active), (9, False))
+
+    def test_query_count_independent_of_batch_size(self):
+        products = Product.objects.bulk_create(
+            Product(name=f"P{i}", price=Decimal("1.00"), stock=10) for i in range(50)
+        )
+        # savepoint, SELECT ... FOR UPDATE, one UPDATE, release
+        with self.assertNumQueries(4):
+            self.patch([{"id": p.id, "stock_delta": 1} for p in products])
+        self.assertEqual(set(Product.objects.filter(name__startswith="P").values_list("stock", flat=True)), {11})
+
+    def test_duplicate_ids_are_rejected(self):
+        res = self.patch([{"id": self.a.id, "stock": 1}, {"id": self.a.id, "stock": 2}])
+        self.assertEqual(res.data["results"], {str(self.a.id): "duplicate"})
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 5)
+
+    def test_invalid_delta_still_claims_its_id(self):
+        res = self.patch([{"id": self.a.id, "price": "abc"}, {"id": str(self.a.id), "stock": 2}])
+        self.assertEqual(res.data["results"], {str(self.a.id): "duplicate"})
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 5)
+
+
+class ProductFacetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tv = Product.objects.create(name="TV", price=Decimal("30000"), category="Electronics", stock=2)
+        Product.objects.create(name="Radio", price=Decimal("800"), category="Electronics", stock=0)
+        Product.objects.create(name="Cap", price=Decimal("200"), category="Fashion", stock=9)
+
+    def facets(self, **params):
+        res = self.client.get("/api/product_facets/", params)
+        self.assertEqual(res.status_code, 200)
+        return res.data["facets"]
+
+    def rollup(self):
+        return sorted(ProductFacetCount.objects.filter(count__gt=0).values_list(
+            "category", "price_band", "in_stock", "is_active", "count"))
+
+    def test_counts_from_rollup(self):
+        data = self.facets(category="Electronics")
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(data["categories"], [
+            {"value": "Electronics", "count": 2}, {"value": "Fashion", "count": 1},
+        ])
+        self.assertEqual(data["availability"], {"in_stock": 1, "out_of_stock": 1})
+        bands = {b["min"]: b["count"] for b in data["price_bands"]}
+        self.assertEqual((bands[500.0], bands[25000.0]), (1, 1))
+
+        with self.assertNumQueries(1):
+            self.facets(in_stock="true", min_price="500")
+        with self.assertNumQueries(2):  # plus: is anything priced exactly at max_price?
+            self.facets(in_stock="true", min_price="500", max_price="50000")
+
+    def test_product_priced_at_max_price_edge_is_counted(self):
+        Product.objects.create(name="Mat", price=Decimal("500.00"), category="Home", stock=1)
+        listed = self.client.get("/api/view_all_products/", {"max_price": "500"}).data["products"]
+        self.assertEqual(sorted(p["name"] for p in listed), ["Cap", "Mat"])
+        self.assertEqual(self.facets(max_price="500")["total"], 2)
+
+    def test_unaligned_price_range_falls_back_to_live_query(self):
+        data = self.facets(min_price="100", max_price="900")
+        self.assertEqual(data["total"], 2)
+
+    def test_rollup_follows_every_write_path(self):
+        self.tv.stock = 0
+        self.tv.save()
+        self.client.patch("/api/bulk_edit_products/", {"updates": [
+            {"id": self.tv.id, "stock_delta": 5, "price": "100"},
+        ]}, format="json")
+        self.client.post("/api/import_products/", {
+            "file": SimpleUploadedFile("f.csv", b"sku,name,price,category\nS1,Hat,50,Fashion\n"),
+        }, format="multipart")
+        Product.objects.get(name="Radio").delete()
+
+        expected = self.rollup()
+        facets.rebuild()
+        self.assertEqual(self.rollup(), expected)
+        self.assertEqual(sum(row[4] for row in expected), Product.objects.count())
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = Product.objects.create(name="Desk", price=Decimal("150.00"), description="x" * 5000)
+        user = User.objects.create_user("buyer", "buyer@example.com", "pw")
+        address = Address.objects.create(user=user, street="1 Main", city="Pune", state="MH", zip_code="411001")
+        self.order = Order.objects.create(user=user, total_amount=Decimal("150.00"), shipping_address=address)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1,
+                                 price_at_purchase=Decimal("150.00"))
+
+    def test_card_preset_skips_description_column(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get("/api/view_all_products/", {"fields": "card"})
+        self.assertEqual(res.data["products"], [
+            {"id": self.product.id, "name": "Desk", "price": 150.0, "image": ""},
+        ])
+        self.assertNotIn("description", ctx.captured_queries[-1]["sql"])
+
+    def test_explicit_fields_and_unknown_field(self):
+        res = self.client.get("/api/view_all_products/", {"fields": "name,stock"})
+        self.assertEqual(res.data["products"], [{"name": "Desk", "stock": 0}])
+        res = self.client.get("/api/view_all_products/", {"fields": "name,password"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_search_projection(self):
+        search.get_backend().rebuild()
+        res = self.client.get("/api/search_products/", {"query": "desk", "fields": "id,name"})
+        self.assertEqual(set(res.data["products"][0]), {"id", "name", "rank"})
+
+    def test_order_projections(self):
+        self.client.force_authenticate(User.objects.get(username="buyer"))
+        res = self.client.get("/api/order_list/", {"fields": "summary"})
+        self.assertEqual(set(res.data["orders"][0]), {"order_id", "status", "total_amount", "created_at"})
+
+        url = f"/api/order_detail/{self.order.id}/"
+        with self.assertNumQueries(2):  # validator + order; no items query
+            res = self.client.get(url, {"fields": "summary"})
+        self.assertNotIn("items", res.data["order"])
+
+        res = self.client.get(url)
+        self.assertEqual(res.data["order"]["shipping_address"]["city"], "Pune")
+        self.assertEqual(res.data["order"]["items"][0]["product_name"], "Desk")
+
+
+class ProductListPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_paginated_render(self):
+        Product.objects.bulk_create(Product(name=f"Card {i}", price=Decimal("5.00")) for i in range(50))
+        res = self.client.get("/ui/product_list/")
+        self.assertEqual(res.content.decode().count('class="product-card"'), 48)
+        self.assertIsNotNone(res.context["next_url"])
+        res = self.client.get("/ui/product_list/" + res.context["next_url"])
+        self.assertEqual(res.content.decode().count('class="product-card"'), 2)
+        self.assertIsNone(res.context["next_url"])
+
+    def test_cards_are_fragment_cached_on_updated_at(self):
+        product = Product.objects.create(name="Original", price=Decimal("5.00"))
+        self.assertContains(self.client.get("/ui/product_list/"), "Original")
+
+        # same updated_at: the cached card is reused even though the row changed
+        Product.objects.filter(pk=product.pk).update(name="Renamed")
+        catalog_cache.bump_version()
+        self.assertContains(self.client.get("/ui/product_list/"), "Original")
+
+        product.refresh_from_db()
+        product.save()  # bumps updated_at
+        catalog_cache.bump_version()
+        self.assertContains(self.client.get("/ui/product_list/"), "Renamed")
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="buyer", email="buyer@example.com")
+        other = User.objects.create(username="other", email="other@example.com")
+        statuses = ["Pending", "Paid", "Delivered", "Paid", "Cancelled"]
+        self.orders = [
+            Order.objects.create(user=self.user, total_amount=Decimal("10.00"), status=s) for s in statuses
+        ]
+        Order.objects.create(user=other, total_amount=Decimal("99.00"))
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        return self.client.get("/api/order_list/", params)
+
+    def test_pages_only_own_orders_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            res = self.get(limit=2, **({"cursor": cursor} if cursor else {}))
+            self.assertEqual(res.status_code, 200)
+            seen += [o["order_id"] for o in res.data["orders"]]
+            cursor = res.data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [o.id for o in reversed(self.orders)])
+
+    def test_status_and_date_filters(self):
+        res = self.get(status="Paid,Delivered", count="exact")
+        self.assertEqual(res.data["total"], 3)
+        self.assertEqual({o["status"] for o in res.data["orders"]}, {"Paid", "Delivered"})
+
+        Order.objects.filter(pk=self.orders[0].pk).update(created_at="2020-01-15T10:00:00Z")
+        res = self.get(date_from="2020-01-15", date_to="2020-01-15")
+        self.assertEqual([o["order_id"] for o in res.data["orders"]], [self.orders[0].id])
+
+        self.assertEqual(self.get(status="Lost").status_code, 400)
+        self.assertEqual(self.get(date_from="15/01/2020").status_code, 400)
+
+    def test_estimated_total(self):
+        res = self.get(count="estimate")
+        self.assertTrue(res.data["total_is_estimate"])
+        self.assertGreaterEqual(res.data["total"], 0)
+
+
+class OrderSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create(username="buyer", email="buyer@example.com")
+        address = Address.objects.create(user=user, street="1 Main", city="Pune", state="MH", zip_code="411001")
+        self.order = Order.objects.create(user=user, total_amount=Decimal("30.00"), shipping_address=address)
+        for name in ("Lamp", "Rug"):
+            product = Product.objects.create(name=name, price=Decimal("15.00"))
+            OrderItem.objects.create(order=self.order, product=product, quantity=1,
+                                     price_at_purchase=Decimal("15.00"))
+        self.url = f"/api/order_detail/{self.order.id}/"
+
+    def set_status(self, value):
+        self.order.status = value
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.save()
+
+    def test_full_detail_is_one_query(self):
+        with self.assertNumQueries(2):  # validator + joined order/user/address/items
+            res = self.client.get(self.url)
+        self.assertEqual([i["product_name"] for i in res.data["order"]["items"]], ["Lamp", "Rug"])
+        self.assertEqual(res.data["order"]["user"], "buyer")
+
+    def test_finished_order_served_from_snapshot(self):
+        self.set_status("Delivered")
+        with self.assertNumQueries(0):
+            res = self.client.get(self.url, {"fields": "order_id,status,items"})
+        self.assertEqual(res.data["order"]["status"], "Delivered")
+        self.assertEqual(len(res.data["order"]["items"]), 2)
+
+        self.set_status("Shipped")  # e.g. an admin correction
+        self.assertIsNone(orders.get_snapshot(self.order.id))
+        self.assertEqual(self.client.get(self.url).data["order"]["status"], "Shipped")
+
+    def test_saving_an_open_order_skips_the_snapshot_rebuild(self):
+        self.order.total_amount = Decimal("28.00")
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):  # status before + UPDATE
+            self.order.save()
+
+    def test_evicted_snapshot_is_rebuilt_on_read(self):
+        self.set_status("Cancelled")
+        cache.clear()
+        self.client.get(self.url)
+        self.assertEqual(orders.get_snapshot(self.order.id)["order"]["status"], "Cancelled")
+
+
+class TokenAuthTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user("buyer", "buyer@example.com", "s3cret-pass")
+        product = Product.objects.create(name="Mug", price=Decimal("5.00"), stock=3)
+        Cart.objects.create(user=self.user, product=product, quantity=1)
+
+    def test_login_token_authenticates_without_user_lookup(self):
+        res = self.client.post("/api/login/", {"username": "buyer", "password": "s3cret-pass"})
+        self.assertEqual(res.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get("/api/view_cart/")
+        self.assertEqual(res.data["cart_items"][0]["item_name"], "Mug")
+        self.assertFalse(any("auth_user" in q["sql"] for q in ctx.captured_queries))
+
+        refreshed = self.client.post("/api/token/refresh/", {"refresh": str(RefreshToken.for_user(self.user))})
+        self.assertIn("access", refreshed.data)
+
+    def test_token_user_is_recorded_as_product_creator(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        res = self.client.post("/api/add_product/", {"name": "Lamp", "price": "12.00"})
+        self.assertEqual(res.status_code, 201)
+        res = self.client.post("/api/import_products/", {
+            "file": SimpleUploadedFile("feed.csv", b"sku,name,price\nB-1,Desk,80.00\n"),
+        }, format="multipart")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            set(Product.objects.filter(name__in=["Lamp", "Desk"]).values_list("created_by_id", flat=True)),
+            {self.user.pk},
+        )
+
+    def test_cart_and_order_endpoints_need_a_token(self):
+        self.assertEqual(self.client.get("/api/view_cart/").status_code, 401)
+        self.assertEqual(self.client.post("/api/place_order/").status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(self.client.get("/api/order_list/").status_code, 401)
+
+
+@override_settings(RATE_LIMITS={
+    "login": {"ip": "100/m", "username": "3/m"},
+    "forget_password": {"ip": "100/m", "email": "2/15m"},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        User.objects.create_user("ann", "ann@example.com", "s3cret-pass")
+
+    def login(self, username, password="wrong"):
+        return self.client.post("/api/login/", {"username": username, "password": password})
+
+    def test_login_rejected_before_authenticating(self):
+        for _ in range(3):
+            self.assertEqual(self.login("Ann").status_code, 401)
+        with self.assertNumQueries(0), self.assertLogs("ecommerce_app.ratelimit", "WARNING"):
+            res = self.login("ann", "s3cret-pass")
+        self.assertEqual(res.status_code, 429)
+        self.assertGreaterEqual(int(res["Retry-After"]), 1)
+        self.assertEqual(self.login("bob").status_code, 401)  # other usernames unaffected
+        self.assertEqual(ratelimit.rejections()["login"], {"ip": 0, "username": 1})
+
+        out = io.StringIO()
+        call_command("rate_limit_stats", "--reset", stdout=out)
+        self.assertIn("login by username: 1", out.getvalue())
+        self.assertEqual(ratelimit.rejections()["login"]["username"], 0)
+
+    def test_forget_password_rejected_before_writing_an_otp(self):
+        for _ in range(2):
+            self.client.post("/api/forget_password/", {"email": "ann@example.com"})
+        PasswordResetOTP.objects.all().delete()
+        with self.assertLogs("ecommerce_app.ratelimit", "WARNING"):
+            res = self.client.post("/api/forget_password/", {"email": "ann@example.com"})
+        self.assertEqual(res.status_code, 429)
+        self.assertFalse(PasswordResetOTP.objects.exists())
+
+    def test_window_slides_instead_of_resetting(self):
+        limiter = ratelimit.SlidingWindowCounter()
+        with mock.patch.object(ratelimit.time, "time", return_value=60 * 1000 + 59):
+            self.assertEqual([limiter.hit("k", 10, 60) for _ in range(10)], [0] * 10)
+        # a fixed window would allow another 10 a couple of seconds later
+        with mock.patch.object(ratelimit.time, "time", return_value=60 * 1001 + 1):
+            self.assertGreater(limiter.hit("k", 10, 60), 0)
+        with mock.patch.object(ratelimit.time, "time", return_value=60 * 1001 + 30):
+            self.assertEqual(limiter.hit("k", 10, 60), 0)
+
+
+class OTPStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username="ann", email="ann@example.com")
+
+    def verify(self, code):
+        return self.client.post("/api/verify_otp/", {"email": "ann@example.com", "otp": code})
+
+    @override_settings(OTP_STORE="ecommerce_app.otp_store.CacheOTPStore", OTP_MAX_ATTEMPTS=2, RATE_LIMIT_ENABLED=False)
+    def test_cache_store(self):
+        self.client.post("/api/forget_password/", {"email": "ann@example.com"})
+        self.assertFalse(PasswordResetOTP.objects.exists())
+        code = re.search(r"\d{6}", OutgoingEmail.objects.get().body).group()
+
+        self.assertEqual(self.verify("wrong").status_code, 400)
+        with self.assertNumQueries(0):
+            res = self.verify(code)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.verify(code).status_code, 404)  # used up: no replay
+
+        code = otp_store.issue(self.user.pk)
+        self.assertEqual(self.verify("wrong").status_code, 400)
+        self.assertEqual(self.verify("wrong").status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 429)  # third attempt: locked out
+        self.assertEqual(self.verify(code).status_code, 404)  # and the code is gone
+
+    @override_settings(OTP_STORE="ecommerce_app.otp_store.ModelOTPStore")
+    def test_model_store_fallback_and_purge(self):
+        code = otp_store.issue(self.user.pk)
+        self.assertEqual(otp_store.verify(self.user.pk, "wrong"), otp_store.INVALID)
+        self.assertEqual(PasswordResetOTP.objects.get().attempts, 1)
+
+        PasswordResetOTP.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(otp_store.verify(self.user.pk, code), otp_store.EXPIRED)
+        code = otp_store.issue(self.user.pk)  # a new code restarts the clock
+        self.assertEqual(otp_store.verify(self.user.pk, code), otp_store.VALID)
+        self.assertEqual(otp_store.verify(self.user.pk, code), otp_store.MISSING)  # used up
+        otp_store.issue(self.user.pk)
+
+        other = User.objects.create(username="bob", email="bob@example.com")
+        otp_store.issue(other.pk)
+        PasswordResetOTP.objects.filter(user=other).update(created_at=timezone.now() - timedelta(hours=1))
+        out = io.StringIO()
+        call_command("purge_expired_otps", "--chunk-size", "1", stdout=out)
+        self.assertIn("Deleted 1 expired OTPs.", out.getvalue())
+        self.assertEqual(list(PasswordResetOTP.objects.values_list("user_id", flat=True)), [self.user.pk])
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username="ann", email="ann@example.com")
+        other = User.objects.create(username="bob", email="bob@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notes = [Notification.objects.create(user=self.user, message=f"note {n}") for n in range(5)]
+            Notification.objects.create(user=other, message="not yours")
+        self.client.force_authenticate(self.user)
+
+    def test_pages_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            res = self.client.get("/api/notifications/", {"limit": 2, **({"cursor": cursor} if cursor else {})})
+            seen += [n["notification_id"] for n in res.data["notifications"]]
+            cursor = res.data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [n.pk for n in reversed(self.notes)])
+        # legacy contract still works for clients without a token
+        res = APIClient().get("/api/notifications/", {"user_id": self.user.pk, "limit": 1})
+        self.assertEqual(len(res.data["notifications"]), 1)
+
+    def test_unread_counter_is_maintained(self):
+        with self.assertNumQueries(1):  # counted once...
+            self.assertEqual(self.client.get("/api/notifications/unread_count/").data["unread"], 5)
+        with self.assertNumQueries(0):  # ...then served from the counter
+            self.client.get("/api/notifications/unread_count/")
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):  # one UPDATE
+            res = self.client.post("/api/notifications/mark_read/",
+                                   {"notification_ids": [self.notes[0].pk, self.notes[1].pk]}, format="json")
+        self.assertEqual(res.data["updated"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, message="new")
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.user.pk), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post("/api/notifications/mark_read/", {"all": True}, format="json")
+        self.assertEqual(res.data["updated"], 4)
+        self.assertEqual(self.client.get("/api/notifications/unread_count/").data["unread"], 0)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 1)  # bob's
+        res = self.client.get("/api/notifications/", {"unread": "true"})
+        self.assertEqual(res.data["notifications"], [])
+
+    def test_mark_read_needs_a_token_and_ids(self):
+        self.assertEqual(APIClient().post("/api/notifications/mark_read/", {"all": True}).status_code, 401)
+        res = self.client.post("/api/notifications/mark_read/", {"notification_ids": "1"}, format="json")
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.client.post("/api/notifications/mark_read/").status_code, 400)
+
+
+class UserResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        users._local.clear()
+        users.reset_stats()
+        self.client = APIClient()
+        self.user = User.objects.create(username="ann", email="ann@example.com")
+
+    def test_repeat_lookups_skip_the_database(self):
+        res = self.client.get("/api/notifications/", {"user_id": self.user.pk})
+        self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(1):  # just the notifications
+            self.client.get("/api/notifications/", {"user_id": self.user.pk})
+        users._local.clear()  # as seen from another process: served by the shared tier
+        with self.assertNumQueries(1):
+            self.client.get("/api/address_list/", {"user_id": self.user.pk})
+        self.assertEqual(users.stats(), {"local_hits": 1, "shared_hits": 1, "misses": 1, "hit_rate": 0.6667})
+
+        out = io.StringIO()
+        call_command("user_cache_stats", "--reset", stdout=out)
+        self.assertIn("hit_rate: 66.7%", out.getvalue())
+        self.assertEqual(users.stats()["hit_rate"], None)
+
+    def test_writes_invalidate(self):
+        self.assertEqual(users.by_email("ann@example.com").pk, self.user.pk)
+        self.assertIsNone(users.by_email("new@example.com"))
+
+        self.user.email = "new@example.com"
+        self.user.save()
+        self.assertIsNone(users.by_email("ann@example.com"))
+        self.assertEqual(users.by_email("new@example.com").pk, self.user.pk)
+
+        pk = self.user.pk
+        self.user.delete()
+        self.assertIsNone(users.by_id(pk))
+        self.assertEqual(self.client.get("/api/address_list/", {"user_id": pk}).status_code, 404)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user("buyer", "buyer@example.com", "pw")
+
+    def fill_cart(self, lines):
+        products = Product.objects.bulk_create(
+            Product(name=f"Line {i}", price=Decimal("2.50"), stock=5) for i in range(lines)
+        )
+        Cart.objects.bulk_create(Cart(user=self.user, product=p, quantity=2) for p in products)
+        return products
+
+    def place(self):
+        self.client.force_authenticate(self.user)
+        return self.client.post("/api/place_order/")
+
+    def test_order_lines_and_stock(self):
+        products = self.fill_cart(3)
+        res = self.place()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["total_amount"], 15.0)
+        order = Order.objects.get(pk=res.data["order_id"])
+        self.assertEqual([(i.quantity, i.subtotal) for i in order.items.all()], [(2, Decimal("5.00"))] * 3)
+        self.assertEqual({p.stock for p in Product.objects.filter(pk__in=[p.pk for p in products])}, {3})
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_query_count_is_independent_of_cart_size(self):
+        self.fill_cart(1)
+        with CaptureQueriesContext(connection) as small:
+            self.place()
+        self.fill_cart(20)
+        with CaptureQueriesContext(connection) as large:
+            self.place()
+        self.assertEqual(len(small), len(large))
+
+    def test_stock_taken_elsewhere_rolls_back_everything(self):
+        first, second = self.fill_cart(2)
+        cart_items = list(Cart.objects.select_related("product").filter(user=self.user))
+        # another checkout takes the stock after this cart was read
+        Product.objects.filter(pk=second.pk).update(stock=1)
+        with self.assertRaises(checkout.InsufficientStock) as ctx:
+            checkout.place_order(self.user, cart_items)
+        self.assertEqual(ctx.exception.product_name, "Line 1")
+        self.assertEqual(Product.objects.get(pk=first.pk).stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username="buyer", email="buyer@example.com")
+        product = Product.objects.create(name="Widget", price=Decimal("4.00"), stock=5)
+        Cart.objects.create(user=self.user, product=product, quantity=1)
+        self.client.force_authenticate(self.user)
+
+    def place(self, key, **data):
+        return self.client.post("/api/place_order/", data, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_stored_response(self):
+        first = self.place("k1")
+        cache.clear()  # replay from the table, not just the cache front
+        with CaptureQueriesContext(connection) as queries:
+            again = self.place("k1")
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertLessEqual(len(queries), 2)
+
+    def test_key_reused_for_other_request_is_rejected(self):
+        self.place("k1")
+        res = self.place("k1", address_id=7)
+        self.assertEqual(res.status_code, 422)
+
+    def test_keys_are_per_user(self):
+        self.place("k1")
+        other = User.objects.create(username="other", email="other@example.com")
+        self.client.force_authenticate(other)
+        res = self.place("k1")
+        self.assertEqual(res.status_code, 400)  # other's own (empty) cart, not a replay
+        self.assertFalse(res.has_header("Idempotent-Replayed"))
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.2)
+    def test_in_flight_duplicate_does_not_execute(self):
+        res = self.place("k1")
+        IdempotencyKey.objects.filter(key="k1").update(state=IdempotencyKey.IN_PROGRESS)
+        cache.clear()
+        res = self.place("k1")
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="buyer", email="buyer@example.com")
+        self.lamp = Product.objects.create(name="Lamp", category="Home", price=Decimal("15.00"), stock=10)
+        self.pen = Product.objects.create(name="Pen", category="Office", price=Decimal("2.50"), stock=10)
+
+    def buy(self, *lines):
+        Cart.objects.bulk_create(Cart(user=self.user, product=p, quantity=q) for p, q in lines)
+        self.client.force_authenticate(self.user)
+        return Order.objects.get(pk=self.client.post("/api/place_order/").data["order_id"])
+
+    def rollup(self):
+        return sorted(
+            SalesRollup.objects.filter(orders__gt=0)
+            .values_list("category", "status", "orders", "units", "revenue")
+        )
+
+    def test_checkout_and_status_changes_update_rollup(self):
+        order = self.buy((self.lamp, 2), (self.pen, 4))
+        self.buy((self.pen, 1))
+        self.assertEqual(self.rollup(), [
+            ("Home", "Pending", 1, 2, Decimal("30.00")),
+            ("Office", "Pending", 2, 5, Decimal("12.50")),
+        ])
+
+        order.status = "Paid"
+        order.save()
+        self.assertEqual(self.rollup(), [
+            ("Home", "Paid", 1, 2, Decimal("30.00")),
+            ("Office", "Paid", 1, 4, Decimal("10.00")),
+            ("Office", "Pending", 1, 1, Decimal("2.50")),
+        ])
+
+        incremental = self.rollup()
+        sales.rebuild(chunk_size=1)
+        self.assertEqual(self.rollup(), incremental)
+
+        order.delete()
+        self.assertEqual(self.rollup(), [("Office", "Pending", 1, 1, Decimal("2.50"))])
+
+    def test_report(self):
+        self.buy((self.lamp, 1), (self.pen, 2))
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/sales_report/", {"group_by": "category"})
+        self.assertEqual(res.data["report"]["rows"], [
+            {"category": "Home", "orders": 1, "units": 1, "revenue": 15.0},
+            {"category": "Office", "orders": 1, "units": 2, "revenue": 5.0},
+        ])
+        res = self.client.get("/api/sales_report/", {"group_by": "", "status": "Paid"})
+        self.assertEqual(res.data["report"]["rows"], [{"orders": 0, "units": 0, "revenue": 0.0}])
+        self.assertEqual(self.client.get("/api/sales_report/", {"group_by": "week"}).status_code, 400)
+
+    def test_order_in_two_categories_counts_once(self):
+        order = self.buy((self.lamp, 1), (self.pen, 2))
+        self.buy((self.pen, 1))
+        expected = {"orders": 2, "units": 4, "revenue": 22.5}
+        res = self.client.get("/api/sales_report/", {"group_by": "day"})
+        self.assertEqual(res.data["report"]["rows"], [{"day": timezone.localdate(), **expected}])
+        res = self.client.get("/api/sales_report/", {"group_by": ""})
+        self.assertEqual(res.data["report"]["rows"], [expected])
+        res = self.client.get("/api/sales_report/", {"group_by": "day", "category": "Office"})
+        self.assertEqual(res.data["report"]["rows"][0]["orders"], 2)
+
+        order.status = "Paid"
+        order.save()
+        sales.rebuild(chunk_size=1)
+        res = self.client.get("/api/sales_report/", {"group_by": "status"})
+        self.assertEqual([(r["status"], r["orders"]) for r in res.data["report"]["rows"]],
+                         [("Paid", 1), ("Pending", 1)])
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(name="Console", price=Decimal("300.00"), stock=5)
+        self.alice = User.objects.create(username="alice", email="alice@example.com")
+        self.bob = User.objects.create(username="bob", email="bob@example.com")
+
+    def add(self, user, quantity):
+        self.client.force_authenticate(user)
+        return self.client.post("/api/add_to_cart/", {"product_id": self.product.id, "quantity": quantity})
+
+    def reserved(self):
+        self.product.refresh_from_db()
+        return self.product.reserved
+
+    def test_cart_lines_hold_stock(self):
+        self.assertEqual(self.add(self.alice, 2).status_code, 200)
+        self.assertEqual(self.add(self.alice, 1).status_code, 200)
+        self.assertEqual(self.reserved(), 3)
+
+        res = self.add(self.bob, 3)
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Only 2", res.data["error"])
+        self.assertFalse(Cart.objects.filter(user=self.bob).exists())
+
+        self.client.force_authenticate(self.alice)
+        self.client.patch("/api/edit_cart/", {"product_id": self.product.id, "quantity": 1})
+        self.assertEqual(self.reserved(), 1)
+        self.client.delete("/api/delete_cart/", {"product_id": self.product.id})
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_expired_holds_are_swept(self):
+        self.add(self.alice, 4)
+        Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command("release_expired_reservations", stdout=io.StringIO())
+        self.assertEqual(self.reserved(), 0)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).available, 5)
+
+    def test_expired_holds_give_way_to_new_carts(self):
+        self.add(self.alice, 4)
+        Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.add(self.bob, 5).status_code, 200)
+        self.assertEqual(self.reserved(), 5)
+
+    def test_checkout_spends_own_hold(self):
+        self.add(self.alice, 2)
+        self.add(self.bob, 3)
+        self.client.force_authenticate(self.alice)
+        res = self.client.post("/api/place_order/")
+        self.assertEqual(res.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (3, 3))
+
+        Product.objects.filter(pk=self.product.pk).update(stock=2)  # restock error elsewhere
+        self.client.force_authenticate(self.bob)
+        res = self.client.post("/api/place_order/")
+        self.assertEqual(res.status_code, 400)
+
+
+class RefusingBackend(locmem.EmailBackend):
+    """locmem, but the server refuses mail to refused@example.com."""
+
+    def send_messages(self, messages):
+        if any("refused@example.com" in m.to for m in messages):
+            raise smtplib.SMTPRecipientsRefused({"refused@example.com": (550, b"No such user")})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="ecommerce_app.tests.RefusingBackend")
+class OutboxTests(TestCase):
+    def test_password_reset_mail_leaves_the_request(self):
+        User.objects.create(username="buyer", email="buyer@example.com")
+        res = APIClient().post("/api/forget_password/", {"email": "buyer@example.com"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().state, OutgoingEmail.QUEUED)
+        self.assertEqual(Job.objects.get().name, outbox.SEND_TASK)
+
+        self.assertEqual(jobs.work(once=True), 1)
+        self.assertEqual(OutgoingEmail.objects.get().state, OutgoingEmail.SENT)
+        self.assertEqual(mail.outbox[0].to, ["buyer@example.com"])
+
+    def test_batch_shares_one_connection_and_retries_refusals(self):
+        for n in range(5):
+            outbox.queue_email("Hi", "Hello", [f"user{n}@example.com"])
+        refused = outbox.queue_email("Hi", "Hello", ["refused@example.com"])
+
+        with mock.patch.object(outbox, "get_connection", wraps=outbox.get_connection) as get_connection, \
+                self.assertLogs("ecommerce_app.jobs", "WARNING"):
+            self.assertEqual(outbox.deliver(batch_size=10), 5)
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+        refused.refresh_from_db()
+        self.assertEqual((refused.state, refused.attempts), (OutgoingEmail.QUEUED, 1))
+        self.assertGreater(refused.send_after, timezone.now())
+        self.assertIn("SMTPRecipientsRefused", refused.last_error)
+        # a send job is queued for when the retry is due
+        self.assertTrue(Job.objects.filter(name=outbox.SEND_TASK, run_at=refused.send_after).exists())
+
+        OutgoingEmail.objects.filter(pk=refused.pk).update(send_after=timezone.now(), max_attempts=2)
+        with self.assertLogs("ecommerce_app.jobs", "ERROR"):
+            call_command("send_outbox", stdout=io.StringIO())
+        refused.refresh_from_db()
+        self.assertEqual(refused.state, OutgoingEmail.FAILED)
+
+
+@jobs.task(name="tests.flaky", max_attempts=2)
+def flaky_task(fail):
+    if fail:
+        raise RuntimeError("boom")
+
+
+class JobQueueTests(TestCase):
+    def test_mail_is_sent_by_worker(self):
+        jobs.enqueue(tasks.send_email, subject="Hi", message="Hello", recipient_list=["buyer@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(jobs.work(once=True), 1)
+        self.assertEqual(Job.objects.get().state, Job.DONE)
+        self.assertEqual(mail.outbox[0].to, ["buyer@example.com"])
+
+    def test_failures_back_off_then_give_up(self):
+        job = jobs.enqueue(flaky_task, fail=True)
+        with self.assertLogs("ecommerce_app.jobs", "WARNING"):
+            jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("boom", job.last_error)
+
+        self.assertEqual(jobs.work(once=True), 0)  # not due yet
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("ecommerce_app.jobs", "ERROR"):
+            jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.FAILED, 2))
+
+    def test_stale_running_job_is_requeued(self):
+        job = jobs.enqueue(flaky_task, fail=False)
+        Job.objects.update(state=Job.RUNNING, locked_at=timezone.now() - timedelta(hours=1))
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.DONE)
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        override = override_settings(ORDER_ARCHIVE_DIR=self.dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create(username="buyer", email="buyer@example.com")
+        address = Address.objects.create(user=self.user, street="1 Main", city="Pune", state="MH", zip_code="411001")
+        product = Product.objects.create(name="Lamp", category="Home", price=Decimal("15.00"), stock=50)
+        self.orders = []
+        for status_ in ("Delivered", "Cancelled", "Pending", "Delivered"):
+            Cart.objects.create(user=self.user, product=product, quantity=2)
+            order = checkout.place_order(self.user, Cart.objects.select_related("product").filter(user=self.user),
+                                         shipping_address=address)
+            order.status = status_
+            order.save()
+            self.orders.append(order)
+        old = timezone.now() - timedelta(days=400)
+        Order.objects.filter(pk__in=[o.pk for o in self.orders[:3]]).update(created_at=old)
+
+    def test_finished_old_orders_move_to_archive(self):
+        report = sales.report({"group_by": "status", "date_from": "2000-01-01"})
+        call_command("archive_orders", "--older-than", "365", "--chunk-size", "1", stdout=io.StringIO())
+
+        archived = [o.pk for o in self.orders[:2]]
+        self.assertEqual(sorted(ArchivedOrder.objects.values_list("order_id", flat=True)), archived)
+        self.assertFalse(Order.objects.filter(pk__in=archived).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=archived).exists())
+        self.assertEqual(Order.objects.count(), 2)
+        # one month shard, one gzip member per chunk
+        self.assertEqual(ArchivedOrder.objects.values("segment").distinct().count(), 1)
+        self.assertEqual(sales.report({"group_by": "status", "date_from": "2000-01-01"}), report)
+
+        url = f"/api/order_detail/{archived[0]}/"
+        res = APIClient().get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["order"]["status"], "Delivered")
+        self.assertEqual(res.data["order"]["shipping_address"]["city"], "Pune")
+        self.assertEqual(res.data["order"]["items"][0]["quantity"], 2)
+        with self.assertNumQueries(0):
+            res = APIClient().get(url, {"fields": "order_id,items"})
+        self.assertEqual(set(res.data["order"]), {"order_id", "items"})
+
+    def test_rebuild_keeps_archived_orders(self):
+        sales.rebuild()  # setUp backdated orders with update(), behind the rollup's back
+        params = [{"group_by": g, "date_from": "2000-01-01"} for g in ("status", "category,day", "")]
+        reports = [sales.report(p) for p in params]
+        call_command("archive_orders", "--older-than", "365", "--chunk-size", "1", stdout=io.StringIO())
+        call_command("rebuild_sales_rollup", "--chunk-size", "1", stdout=io.StringIO())
+        self.assertEqual([sales.report(p) for p in params], reports)
+
+    def export_rows(self, out_dir):
+        manifest = exports.export_orders(timezone.now() - timedelta(days=3650),
+                                         timezone.now() + timedelta(days=1), out_dir, workers=1)
+        parts = manifest["shards"] + ([manifest["archived"]] if manifest["archived"] else [])
+        rows = []
+        for part in parts:
+            with open(os.path.join(out_dir, part["file"])) as fh:
+                rows += list(csv.DictReader(fh))
+        self.assertEqual(len(rows), manifest["rows"])
+        return sorted(rows, key=lambda r: (int(r["order_id"]), int(r["item_id"]))), manifest
+
+    def test_archived_orders_stay_in_order_export(self):
+        with tempfile.TemporaryDirectory() as before, tempfile.TemporaryDirectory() as after:
+            live, _ = self.export_rows(before)
+            call_command("archive_orders", "--older-than", "365", "--chunk-size", "1", stdout=io.StringIO())
+            rows, manifest = self.export_rows(after)
+        self.assertEqual(rows, live)
+        self.assertEqual(manifest["archived"]["rows"], 2)
+        self.assertEqual(manifest["archived"]["orders_without_lines"], 0)
+
+    def test_archived_order_without_snapshot_gets_an_etag(self):
+        call_command("archive_orders", "--older-than", "365", stdout=io.StringIO())
+        cache.clear()
+        url = f"/api/order_detail/{self.orders[0].pk}/"
+        res = APIClient().get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.has_header("ETag"))
+        cache.clear()
+        res = APIClient().get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 304)
+
+    def test_read_notifications_are_archived(self):
+        Notification.objects.create(user=self.user, message="old, read", is_read=True)
+        Notification.objects.create(user=self.user, message="old, unread")
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=400))
+        call_command("archive_orders", "--older-than", "365", "--notifications", stdout=io.StringIO())
+        self.assertEqual(list(Notification.objects.values_list("message", flat=True)), ["old, unread"])
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("concurrent checkouts need an on-disk or server database")
+        self.product = Product.objects.create(name="Hot item", price=Decimal("10.00"), stock=10)
+        self.users = [User.objects.create(username=f"u{i}", email=f"u{i}@example.com") for i in range(25)]
+        Cart.objects.bulk_create(Cart(user=u, product=self.product, quantity=1) for u in self.users)
+
+    def test_one_sku_is_never_oversold(self):
+        tokens = {u.pk: RefreshToken.for_user(u).access_token for u in self.users}
+        results = []
+        barrier = threading.Barrier(len(self.users))
+
+        def buy(user):
+            try:
+                barrier.wait()
+                res = APIClient().post("/api/place_order/", HTTP_AUTHORIZATION=f"Bearer {tokens[user.pk]}")
+                results.append(res.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy, args=(u,)) for u in self.users]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(results.count(200), 10)
+        self.assertEqual(results.count(400), 15)
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(Order.objects.count(), 10)
@@ -1,21 +1,28 @@
 # ecommerce_app/urls.py
 
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 urlpatterns = [
     # Authentication
     path("register/", views.RegisterView.as_view(), name="register"),
     path("login/", views.LoginView.as_view(), name="login"),
+    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("forget_password/", views.ForgetPasswordView.as_view(), name="forget_password"),
     path("reset_password/", views.ResetPasswordView.as_view(), name="reset_password"),
     path("verify_otp/", views.VerifyOTPView.as_view(), name="verify_otp"),
 
     # Product Management
     path("add_product/", views.AddProductView.as_view(), name="add_product"),
+    path("import_products/", views.BulkImportProductsView.as_view(), name="import_products"),
     path("edit_product/<int:pk>/", views.EditProductView.as_view(), name="edit_product"),
     path("delete_product/<int:pk>/", views.DeleteProductView.as_view(), name="delete_product"),
+    path("bulk_edit_products/", views.BulkEditProductsView.as_view(), name="bulk_edit_products"),
     path("view_all_products/", views.ViewAllProducts.as_view(), name="view_all_products"),
+    path("product_facets/", views.ProductFacetsView.as_view(), name="product_facets"),
+    path("search_products/", views.ProductSearchView.as_view(), name="search_products"),
+    path("export_catalog/", views.CatalogExportView.as_view(), name="export_catalog"),
 
 
 
@@ -29,6 +36,8 @@ urlpatterns = [
     path("place_order/", views.PlaceOrderView.as_view(), name="place_order"),
     path("order_list/", views.Orderlistview.as_view(), name="order_list"),
     path("order_detail/<int:pk>/", views.Orderdetailview.as_view(), name="order_detail"),
+    path("sales_report/", views.SalesReportView.as_view(), name="sales_report"),
+    path("payment_confirm/", views.Paymentconfirmview.as_view(), name="payment_confirm"),
 
     # Addresses
     path("add_address/", views.AddressCreateView.as_view(), name="add_address"),
@@ -39,5 +48,7 @@ urlpatterns = [
     path("apply_coupon/", views.CouponApplyView.as_view(), name="apply_coupon"),
     path("Coupon_Remove/", views.CouponRemoveView.as_view(), name="coupon_remove"),
     path("notifications/", views.NotificationListView.as_view(), name="notifications"),
+    path("notifications/unread_count/", views.NotificationUnreadCountView.as_view(), name="notifications_unread_count"),
+    path("notifications/mark_read/", views.NotificationMarkReadView.as_view(), name="notifications_mark_read"),
 ]
 
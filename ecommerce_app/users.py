@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+
+# What the views need to know about the caller. ``pk`` so it can stand in
+# for a User wherever only the id is used (filters, user_id=..., FKs).
+UserRecord = namedtuple("UserRecord", "pk username email is_active")
+
+FIELDS = ("pk", "username", "email", "is_active")
+LOCAL_SIZE = 4096
+LOCAL_TTL = 30          # seconds; bounds how stale another process's copy can be
+FLUSH_EVERY = 100       # lookups between pushes of this process's counters
+STATS_KEY = "users:stats:{}"
+COUNTERS = ("local_hits", "shared_hits", "misses")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _LRU:
+    """Small thread-safe per-process LRU with a TTL on every entry."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = _LRU(LOCAL_SIZE)
+_counts = dict.fromkeys(COUNTERS, 0)
+_counts_lock = threading.Lock()
+
+
+def id_key(pk):
+    return f"users:id:{pk}"
+
+
+def email_key(email):
+    return f"users:email:{email}"
+
+
+def _count(name):
+    with _counts_lock:
+        _counts[name] += 1
+        if sum(_counts.values()) < FLUSH_EVERY:
+            return
+        pending = dict(_counts)
+        for counter in _counts:
+            _counts[counter] = 0
+    _flush(pending)
+
+
+def _flush(pending):
+    for name, n in pending.items():
+        if not n:
+            continue
+        try:
+            cache.incr(STATS_KEY.format(name), n)
+        except ValueError:
+            if not cache.add(STATS_KEY.format(name), n, timeout=None):
+                cache.incr(STATS_KEY.format(name), n)
+
+
+def flush_stats():
+    with _counts_lock:
+        pending = dict(_counts)
+        for counter in _counts:
+            _counts[counter] = 0
+    _flush(pending)
+
+
+def stats():
+    """Lookup counters summed over every process that has flushed, with the hit rate."""
+    flush_stats()
+    totals = {name: cache.get(STATS_KEY.format(name), 0) for name in COUNTERS}
+    lookups = sum(totals.values())
+    totals["hit_rate"] = round((totals["local_hits"] + totals["shared_hits"]) / lookups, 4) if lookups else None
+    return totals
+
+
+def reset_stats():
+    with _counts_lock:
+        for counter in _counts:
+            _counts[counter] = 0
+    cache.delete_many([STATS_KEY.format(name) for name in COUNTERS])
+
+
+def _lookup(key, load):
+    value = _local.get(key)
+    if value is not None:
+        _count("local_hits")
+        return value
+    value = cache.get(key)
+    if value is not None:
+        _count("shared_hits")
+    else:
+        _count("misses")
+        value = load()
+        # misses are cached too, as False, so unknown emails/ids don't hit the DB every time
+        cache.set(key, value, _setting("USER_CACHE_TIMEOUT", 300))
+    _local.set(key, value, _setting("USER_CACHE_LOCAL_TTL", LOCAL_TTL))
+    return value
+
+
+def _load(**lookup):
+    # email isn't unique in auth_user; the oldest account wins, consistently
+    row = User.objects.filter(**lookup).order_by("pk").values_list(*FIELDS).first()
+    return UserRecord(*row) if row else False
+
+
+def by_id(pk):
+    """The UserRecord for ``pk`` (int or numeric string), or None."""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return _lookup(id_key(pk), lambda: _load(pk=pk)) or None
+
+
+def _load_id(email):
+    record = _load(email=email)
+    return record.pk if record else False
+
+
+def by_email(email):
+    """
+    The UserRecord for an exact ``email``, or None. The email entry only
+    holds the id and the record it points to must still carry that email,
+    so a user changing their address can't be found under the old one.
+    """
+    if not email:
+        return None
+    key = email_key(email)
+    pk = _lookup(key, lambda: _load_id(email))
+    record = by_id(pk) if pk else None
+    if record and record.email != email:
+        _local.delete(key)
+        cache.delete(key)
+        pk = _lookup(key, lambda: _load_id(email))
+        record = by_id(pk) if pk else None
+    return record or None
+
+
+def invalidate(pk, *emails):
+    """Drop ``pk``'s entries, and those of ``emails`` plus whatever email was cached for it."""
+    cached = _local.get(id_key(pk)) or cache.get(id_key(pk))
+    if cached:
+        emails += (cached.email,)
+    keys = [id_key(pk), *(email_key(e) for e in emails if e)]
+    _local.delete(*keys)
+    cache.delete_many(keys)
@@ -1,16 +1,19 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
-from django.conf import settings
 from decimal import Decimal
 from django.views.generic import TemplateView
 from datetime import datetime
 from django.shortcuts import render
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models.functions import Left
 from django.views import View
 
 
@@ -19,8 +22,20 @@ def year_context(request):
 
 
 from .models import (
-    Product, Cart, Order, OrderItem, Address, Notification, PasswordResetOTP
+    Product, Cart, Order, Address, Notification, Reservation
 )
+from . import (
+    archive, bulk_edit, catalog_cache, checkout, exports, facets, imports, notifications, orders, otp_store, outbox,
+    reservations, sales, search, users,
+)
+from .conditional import conditional, queryset_validators
+from .idempotency import idempotent
+from .ratelimit import rate_limited
+from .catalog import (
+    InvalidFilter, InvalidProduct, clean_product_data, filter_products, parse_bool, product_to_dict,
+)
+from .pagination import MAX_PAGE_SIZE, InvalidCursor, estimate_count, keyset_page, parse_page_size
+from .projection import ORDER_DETAIL, ORDERS, PRODUCTS, InvalidFields
 
 # ─────────────────────────────
 # Auth
@@ -51,6 +66,7 @@ class RegisterView(APIView):
 
 
 class LoginView(APIView):
+    @rate_limited("login")
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
@@ -59,7 +75,9 @@ class LoginView(APIView):
         user = authenticate(request, username=username, password=password)
         if user is None:
             return Response({"error": "Invalid username or password."}, status=status.HTTP_401_UNAUTHORIZED)
-        return Response({"message": "Login successful!", "user_id": user.id}, status=status.HTTP_200_OK)
+        refresh = RefreshToken.for_user(user)
+        return Response({"message": "Login successful!", "user_id": user.id,
+                         "access": str(refresh.access_token), "refresh": str(refresh)}, status=status.HTTP_200_OK)
     
 
 class logoutview(APIView):
@@ -72,6 +90,7 @@ class logoutview(APIView):
 # ─────────────────────────────
 
 class ForgetPasswordView(APIView):
+    @rate_limited("forget_password")
     def post(self, request):
         email = request.data.get('email')
         if not email:
@@ -81,46 +100,42 @@ class ForgetPasswordView(APIView):
         except ValidationError:
             return Response({"error": "Invalid email address."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user = users.by_email(email)
+        if user is None:
             return Response({"error": "Email not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        import random
-        otp = f"{random.randint(100000, 999999)}"
+        otp = otp_store.issue(user.pk)
 
-        PasswordResetOTP.objects.update_or_create(user=user, defaults={"otp": otp})
-
-        send_mail(
+        # sent from the outbox by a job worker so SMTP latency stays off the request
+        outbox.queue_email(
             subject="Password Reset OTP",
-            message=f"Your OTP for password reset is: {otp}. It is valid for 15 minutes.",
-            from_email=settings.DEFAULT_FROM_EMAIL,
+            message=f"Your OTP for password reset is: {otp}. It is valid for {otp_store.ttl() // 60} minutes.",
             recipient_list=[email],
-            fail_silently=False,
         )
         return Response({"message": "OTP has been sent to your email."}, status=status.HTTP_200_OK)
 
 
 class VerifyOTPView(APIView):
+    @rate_limited("verify_otp")
     def post(self, request):
         email = request.data.get('email')
         otp = request.data.get('otp')
         if not all([email, otp]):
             return Response({"error": "Email and OTP are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user = users.by_email(email)
+        if user is None:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            otp_obj = PasswordResetOTP.objects.get(user=user)  # OneToOne
-        except PasswordResetOTP.DoesNotExist:
+        result = otp_store.verify(user.pk, otp)
+        if result == otp_store.MISSING:
             return Response({"error": "No OTP found for this user."}, status=status.HTTP_404_NOT_FOUND)
-
-        if otp_obj.is_expired():
+        if result == otp_store.EXPIRED:
             return Response({"error": "OTP expired. Please request a new one."}, status=status.HTTP_400_BAD_REQUEST)
-        if otp_obj.otp != str(otp):
+        if result == otp_store.LOCKED:
+            return Response({"error": "Too many wrong attempts. Please request a new OTP."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS)
+        if result != otp_store.VALID:
             return Response({"error": "Invalid OTP."}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"message": "OTP verified successfully."}, status=status.HTTP_200_OK)
@@ -168,9 +183,8 @@ class UserProfileView(APIView):
                 return Response({"error": "User ID is required or authenticate to get your profile."},
                                 status=status.HTTP_400_BAD_REQUEST)
         else:
-            try:
-                user = User.objects.get(id=int(user_id))
-            except (User.DoesNotExist, ValueError, TypeError):
+            user = users.by_id(user_id)
+            if user is None:
                 return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         data = {"username": user.username, "email": user.email}
@@ -194,36 +208,25 @@ class Deleteuserview(APIView):
 # ─────────────────────────────
 class AddProductView(APIView):
     def post(self, request):
-        name = request.data.get('name')
-        price = request.data.get('price')
-        description = request.data.get('description', "")
-        category = request.data.get('category', "")
-        stock = request.data.get('stock', 0)
-        image = request.data.get('image', "")  # ✅ Accept image URL
-
-        if not all([name, price]):
-            return Response({"error": "name and price are required."}, status=status.HTTP_400_BAD_REQUEST)
-
+        # same rules as the bulk importer (name/price required, Decimal price, int stock)
         try:
-            price = Decimal(str(price))
-            stock = int(stock)
-        except (ValueError, TypeError):
-            return Response({"error": "Invalid price or stock."}, status=status.HTTP_400_BAD_REQUEST)
+            fields = clean_product_data(request.data)
+        except InvalidProduct as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if fields["sku"] and Product.objects.filter(sku=fields["sku"]).exists():
+            return Response({"error": "SKU already exists."}, status=status.HTTP_400_BAD_REQUEST)
 
         product = Product.objects.create(
-            name=name,
-            price=price,
-            description=description,
-            category=category,
-            stock=stock,
-            image=image,  # ✅ Save image URL
-            created_by=request.user if getattr(request, "user", None) and request.user.is_authenticated else None,
+            **fields,
+            # only the id: with a Bearer token request.user is a TokenUser, not a User
+            created_by_id=request.user.pk if request.user.is_authenticated else None,
         )
 
         return Response({
             "message": "Product added successfully!",
             "product": {
                 "id": product.id,
+                "sku": product.sku,
                 "name": product.name,
                 "price": float(product.price),
                 "description": product.description,
@@ -236,8 +239,9 @@ class AddProductView(APIView):
 
 
 class EditProductView(APIView):
-    def patch(self, request):
-        product_id = request.data.get('id')
+    def patch(self, request, pk=None):
+        # the URL's pk wins over an id in the body
+        product_id = pk or request.data.get('id')
         if not product_id:
             return Response({"error": "id is required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
@@ -287,8 +291,9 @@ class EditProductView(APIView):
 
 
 class DeleteProductView(APIView):
-    def delete(self, request):
-        product_id = request.data.get('id')
+    def delete(self, request, pk=None):
+        # the URL's pk wins over an id in the body
+        product_id = pk or request.data.get('id')
         if not product_id:
             return Response({"error": "id is required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
@@ -299,67 +304,181 @@ class DeleteProductView(APIView):
         return Response({"message": "Product deleted successfully!"}, status=status.HTTP_200_OK)
 
 
+class BulkImportProductsView(APIView):
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "A CSV or JSONL file is required."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get("format") or imports.guess_format(upload.name)
+        if fmt not in imports.FORMATS:
+            return Response({"error": "format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = parse_page_size(request.data.get("batch_size"),
+                                         default=imports.BATCH_SIZE, maximum=10000)
+        except ValueError:
+            return Response({"error": "Invalid batch_size."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = imports.import_products(
+            imports.parse_rows(imports.text_stream(upload), fmt),
+            batch_size=batch_size,
+            created_by_id=request.user.pk if request.user.is_authenticated else None,
+        )
+        return Response({"message": "Import finished.", **result.as_dict()}, status=status.HTTP_200_OK)
+
+
+class BulkEditProductsView(APIView):
+    def patch(self, request):
+        updates = request.data.get("updates")
+        if not isinstance(updates, list) or not updates:
+            return Response({"error": "updates must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(updates) > bulk_edit.MAX_UPDATES:
+            return Response({"error": f"At most {bulk_edit.MAX_UPDATES} updates per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_edit.apply_product_updates(updates)
+        updated = sum(1 for r in results.values() if r == bulk_edit.OK)
+        return Response({"updated": updated, "results": results}, status=status.HTTP_200_OK)
+
+
+def catalog_validators(namespace):
+    def validator(request, *args, **kwargs):
+        # cached under the catalog version, so a revalidation that still
+        # matches costs no queries at all
+        key = catalog_cache.page_key(namespace, request.GET)
+        try:
+            return catalog_cache.get_or_compute(
+                key, lambda: queryset_validators(filter_products(request.GET), key)
+            )
+        except InvalidFilter:
+            return None, None
+    return validator
+
+
 class ViewAllProducts(APIView):
+    @conditional(catalog_validators("products_etag"))
     def get(self, request):
-        products = Product.objects.all().order_by("-created_at")
-        product_list = [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "price": float(p.price),
-                "stock": p.stock,
-                "category": p.category,
-                "image": p.image or "",  # ✅ Include image field
-            }
-            for p in products
-        ]
-        return Response({"products": product_list}, status=status.HTTP_200_OK)
+        key = catalog_cache.page_key("products", request.query_params)
+        try:
+            page = catalog_cache.get_or_compute(key, lambda: self.build_page(request.query_params))
+        except InvalidFilter:
+            return Response({"error": "Invalid filter value."}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidFields as exc:
+            return Response({"error": f"Unknown fields: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def build_page(params):
+        limit = parse_page_size(params.get("limit"))
+        fields = PRODUCTS.parse(params.get("fields"))
+        # only the requested columns (+ the cursor key) leave the database
+        products = filter_products(params).values(*PRODUCTS.select(fields, "id", "created_at"))
+        products, next_cursor = keyset_page(products, params.get("cursor"), limit)
+        return {"products": [product_to_dict(p, fields) for p in products], "next_cursor": next_cursor}
+
 
 
 
+class ProductFacetsView(APIView):
+    def get(self, request):
+        key = catalog_cache.page_key("facets", request.query_params)
+        try:
+            data = catalog_cache.get_or_compute(key, lambda: facets.compute_facets(request.query_params))
+        except InvalidFilter:
+            return Response({"error": "Invalid filter value."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"facets": data}, status=status.HTTP_200_OK)
+
 
 class ProductSearchView(APIView):
     def get(self, request):
-        query = request.query_params.get('query', '')
-        products = Product.objects.filter(name__icontains=query).order_by("-created_at")
-        data = [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "price": float(p.price),
-                "category": p.category,
-                "stock": p.stock,
-                "image": getattr(p, "image", ""),
-            }
-            for p in products
-        ]
+        query = request.query_params.get('query', '').strip()
+        if not query:
+            return Response({"error": "query is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = parse_page_size(request.query_params.get("limit"),
+                                    default=search.DEFAULT_LIMIT, maximum=search.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = PRODUCTS.parse(request.query_params.get("fields"))
+        except InvalidFields as exc:
+            return Response({"error": f"Unknown fields: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Product.objects.filter(is_active=True).only(*PRODUCTS.select(fields, "id"))
+        products = search.search_products(query, limit=limit, queryset=queryset)
+        data = [dict(product_to_dict(p, fields), rank=round(float(p.rank), 4)) for p in products]
         return Response({"products": data}, status=status.HTTP_200_OK)
     
+class CatalogExportView(View):
+    # plain View: DRF would treat ?format= as a renderer override
+    def get(self, request):
+        fmt = request.GET.get("format", "jsonl")
+        if fmt not in exports.FORMATS:
+            return JsonResponse({"error": "format must be jsonl or csv."}, status=400)
+        try:
+            gzip = parse_bool(request.GET.get("gzip")) or False
+        except InvalidFilter:
+            return JsonResponse({"error": "Invalid gzip flag."}, status=400)
+
+        filename = f"catalog.{fmt}" + (".gz" if gzip else "")
+        response = StreamingHttpResponse(
+            exports.export_catalog(fmt, gzip=gzip),
+            content_type="application/gzip" if gzip else exports.CONTENT_TYPES[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class ProductListView(View):
+    page_size = 48
+
+    @conditional(catalog_validators("product_list_etag"))
     def get(self, request):
-        products = Product.objects.all().order_by("-created_at")
-        return render(request, "e-com/product_list.html", {"products": products})    
-  
+        key = catalog_cache.page_key("product_list", request.GET)
+        try:
+            page = catalog_cache.get_or_compute(key, lambda: self.build_page(request.GET))
+        except (InvalidFilter, InvalidCursor, ValueError):
+            return HttpResponseBadRequest("Invalid product list parameters.")
+
+        next_url = None
+        if page["next_cursor"]:
+            params = request.GET.copy()
+            params["cursor"] = page["next_cursor"]
+            next_url = f"?{params.urlencode()}"
+        # each card is fragment-cached on (id, updated_at) in the template,
+        # so only products that changed since the last render are re-evaluated
+        return render(request, "e-com/product_list.html", {"products": page["products"], "next_url": next_url})
+
+    @classmethod
+    def build_page(cls, params):
+        limit = parse_page_size(params.get("limit"), default=cls.page_size)
+        products = (
+            filter_products(params)
+            .values("id", "name", "category", "stock", "price", "image", "created_at", "updated_at")
+            .annotate(blurb=Left("description", 160))  # the card clips it anyway
+        )
+        products, next_cursor = keyset_page(products, params.get("cursor"), limit)
+        return {"products": products, "next_cursor": next_cursor}
+
 
 # ─────────────────────────────
 # Cart
 # ─────────────────────────────
 
 class Addproducttocartview(APIView):
+    permission_classes = [IsAuthenticated]
+
     def post(self, request):
-        email = request.data.get('email')
+        user = request.user
         product_id = request.data.get('product_id')
         quantity = request.data.get('quantity', 1)
 
-        if not all([email, product_id]):
-            return Response({"error": "Email and Product ID are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if not product_id:
+            return Response({"error": "Product ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             product = Product.objects.get(id=int(product_id))
         except (Product.DoesNotExist, ValueError, TypeError):
@@ -371,49 +490,53 @@ class Addproducttocartview(APIView):
         except (ValueError, TypeError):
             return Response({"error": "Invalid quantity."}, status=status.HTTP_400_BAD_REQUEST)
 
-        item, created = Cart.objects.get_or_create(user=user, product=product, defaults={"quantity": qty})
-        if not created:
-            item.quantity += qty
-            item.save()
+        # the cart line and its stock hold commit together, or not at all
+        try:
+            with transaction.atomic():
+                item, created = Cart.objects.get_or_create(
+                    user_id=user.pk, product=product, defaults={"quantity": qty}
+                )
+                if not created:
+                    item.quantity += qty
+                    item.save()
+                hold = reservations.hold(user, product.id, item.quantity)
+        except reservations.Unavailable as exc:
+            return Response({"error": f"Only {exc.available} of {product.name} available."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({"message": "Product added to cart.", "quantity": item.quantity}, status=status.HTTP_200_OK)
+        return Response({"message": "Product added to cart.", "quantity": item.quantity,
+                         "reserved_until": hold.expires_at}, status=status.HTTP_200_OK)
 
 
 class ViewCartView(APIView):
-    def get(self, request):
-        email = request.query_params.get('email')
-        if not email:
-            return Response({"error": "Email is required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+    permission_classes = [IsAuthenticated]
 
-        cart_items = Cart.objects.select_related("product").filter(user=user)
+    def get(self, request):
+        user_id = request.user.pk
+        cart_items = Cart.objects.select_related("product").filter(user_id=user_id)
+        holds = dict(Reservation.objects.filter(user_id=user_id).values_list("product_id", "expires_at"))
         data = [{
             "product_id": ci.product.id,
             "item_name": ci.product.name,
             "item_price": float(ci.product.price),
             "quantity": ci.quantity,
-            "subtotal": float(ci.product.price * ci.quantity)
+            "subtotal": float(ci.product.price * ci.quantity),
+            "reserved_until": holds.get(ci.product.id),
         } for ci in cart_items]
         total = sum(ci.product.price * ci.quantity for ci in cart_items)
         return Response({"cart_items": data, "total_amount": float(total)}, status=status.HTTP_200_OK)
     
 class Editcartview(APIView):
+    permission_classes = [IsAuthenticated]
+
     def patch(self, request):
-        email = request.data.get('email')
+        user = request.user
         product_id = request.data.get('product_id')
         quantity = request.data.get('quantity')
 
-        if not all([email, product_id, quantity]):
-            return Response({"error": "Email, Product ID, and Quantity are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if not all([product_id, quantity]):
+            return Response({"error": "Product ID and Quantity are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             product = Product.objects.get(id=int(product_id))
         except (Product.DoesNotExist, ValueError, TypeError):
@@ -426,38 +549,45 @@ class Editcartview(APIView):
             return Response({"error": "Invalid quantity."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            item = Cart.objects.get(user=user, product=product)
+            item = Cart.objects.get(user_id=user.pk, product=product)
         except Cart.DoesNotExist:
             return Response({"error": "Product not in cart."}, status=status.HTTP_404_NOT_FOUND)
 
-        item.quantity = qty
-        item.save()
-        return Response({"message": "Cart updated successfully.", "quantity": item.quantity}, status=status.HTTP_200_OK)
+        try:
+            with transaction.atomic():
+                item.quantity = qty
+                item.save()
+                hold = reservations.hold(user, product.id, qty)
+        except reservations.Unavailable as exc:
+            return Response({"error": f"Only {exc.available} of {product.name} available."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Cart updated successfully.", "quantity": item.quantity,
+                         "reserved_until": hold.expires_at}, status=status.HTTP_200_OK)
 
 
 class Deleteitemincartview(APIView):
+    permission_classes = [IsAuthenticated]
+
     def delete(self, request):
-        email = request.data.get('email')
+        user = request.user
         product_id = request.data.get('product_id')
 
-        if not all([email, product_id]):
-            return Response({"error": "Email and Product ID are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if not product_id:
+            return Response({"error": "Product ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             product = Product.objects.get(id=int(product_id))
         except (Product.DoesNotExist, ValueError, TypeError):
             return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            item = Cart.objects.get(user=user, product=product)
+            item = Cart.objects.get(user_id=user.pk, product=product)
         except Cart.DoesNotExist:
             return Response({"error": "Product not in cart."}, status=status.HTTP_404_NOT_FOUND)
 
-        item.delete()
+        with transaction.atomic():
+            item.delete()
+            reservations.release(user, [product.id])
         return Response({"message": "Product removed from cart successfully.", "product": product.name},
                         status=status.HTTP_200_OK)
 
@@ -466,104 +596,130 @@ class Deleteitemincartview(APIView):
 # ─────────────────────────────
 
 class PlaceOrderView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @idempotent("place_order")
     def post(self, request):
-        email = request.data.get('email')
+        user = request.user
         address_id = request.data.get('address_id')  # optional – attach saved address
 
-        if not email:
-            return Response({"error": "Email is required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-
-        cart_items = list(Cart.objects.select_related("product").filter(user=user))
+        cart_items = list(Cart.objects.select_related("product").filter(user_id=user.pk))
         if not cart_items:
             return Response({"error": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # compute total, check stock
-        total = Decimal("0.00")
+        # cheap early reject on what we already loaded; the authoritative,
+        # race-free check is the conditional UPDATE in checkout.place_order
         for ci in cart_items:
             if ci.quantity > ci.product.stock:
                 return Response(
                     {"error": f"Insufficient stock for {ci.product.name}"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            total += ci.product.price * ci.quantity
 
         shipping_addr = None
         if address_id:
             try:
-                shipping_addr = Address.objects.get(id=int(address_id), user=user)
+                shipping_addr = Address.objects.get(id=int(address_id), user_id=user.pk)
             except (Address.DoesNotExist, ValueError, TypeError):
                 return Response({"error": "Address not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        order = Order.objects.create(user=user, total_amount=total, status="Pending", shipping_address=shipping_addr)
-
-        for ci in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=ci.product,
-                quantity=ci.quantity,
-                price_at_purchase=ci.product.price,
-            )
-            # reduce stock
-            ci.product.stock -= ci.quantity
-            ci.product.save()
-
-        # clear cart
-        Cart.objects.filter(user=user).delete()
+        try:
+            order = checkout.place_order(user, cart_items, shipping_addr)
+        except checkout.InsufficientStock as exc:
+            return Response({"error": f"Insufficient stock for {exc.product_name}"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"message": "Order placed successfully.", "order_id": order.id,
                          "total_amount": float(order.total_amount)}, status=status.HTTP_200_OK)
 
 
 class Orderlistview(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request):
-        orders = Order.objects.select_related("user").all().order_by("-id")
-        order_data = [{
-            "order_id": o.id,
-            "user": o.user.username,
-            "total_amount": float(o.total_amount),
-            "status": o.status,
-            "created_at": o.created_at,
-        } for o in orders]
-        return Response({"orders": order_data}, status=status.HTTP_200_OK)
+        user_id = request.user.pk
+        params = request.query_params
+        count = params.get("count")
+        if count not in (None, "", "exact", "estimate"):
+            return Response({"error": "count must be 'exact' or 'estimate'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = ORDERS.parse(params.get("fields"))
+            limit = parse_page_size(params.get("limit"))
+            qs = orders.filter_orders(params, Order.objects.filter(user_id=user_id))
+            # the user join only happens when "user" is asked for
+            page, next_cursor = keyset_page(
+                qs.values(*ORDERS.select(fields, "id", "created_at")), params.get("cursor"), limit
+            )
+        except InvalidFields as exc:
+            return Response({"error": f"Unknown fields: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidFilter:
+            return Response({"error": "Invalid filter value."}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = {"orders": [ORDERS.render(o, fields) for o in page], "next_cursor": next_cursor}
+        if count == "exact":
+            data["total"] = qs.count()
+        elif count == "estimate":
+            data["total"] = estimate_count(qs)
+            data["total_is_estimate"] = True
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def order_validators(request, pk):
+    snapshot = orders.get_snapshot(pk)
+    if snapshot is not None:
+        updated_at = snapshot["updated_at"]
+    else:
+        updated_at = Order.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+    if updated_at is None:
+        # archived, and its snapshot evicted: read it back (and re-cache it) once
+        snapshot = archive.snapshot_order(pk)
+        if snapshot is None:
+            return None, None
+        updated_at = snapshot["updated_at"]
+    # one ETag per representation, since ?fields= changes the body
+    return f"order-{pk}-{updated_at.timestamp()}-{request.GET.get('fields', '')}", updated_at
 
 
 class Orderdetailview(APIView):
-    def get(self, request, order_id):
-        try:
-            order = Order.objects.get(id=int(order_id))
-        except (Order.DoesNotExist, ValueError, TypeError):
-            return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+    @conditional(order_validators)
+    def get(self, request, pk):
+        try:
+            fields = ORDER_DETAIL.parse(request.query_params.get("fields"))
+        except InvalidFields as exc:
+            return Response({"error": f"Unknown fields: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # finished orders never change: serve them from the cached snapshot
+        snapshot = orders.get_snapshot(pk)
+        if snapshot is not None:
+            order_data = {name: snapshot["order"][name] for name in fields}
+            return Response({"order": order_data}, status=status.HTTP_200_OK)
+
+        loaded = orders.load_order(pk, fields)
+        if loaded is None:
+            # moved to cold storage by archive_orders? Archived orders are
+            # final, so the document is kept as a snapshot from then on.
+            snapshot = archive.snapshot_order(pk)
+            if snapshot is None:
+                return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"order": {name: snapshot["order"][name] for name in fields}}, status=status.HTTP_200_OK)
+        order_data, order_status, _ = loaded
+        if order_status in orders.FINAL_STATUSES:
+            orders.build_snapshot(pk)  # evicted (or written before this code); put it back
+        return Response({"order": order_data}, status=status.HTTP_200_OK)
 
-        items = order.items.select_related("product").all()
-        items_data = [{
-            "product_name": it.product.name,
-            "quantity": it.quantity,
-            "price": float(it.price_at_purchase),
-            "subtotal": float(it.subtotal),
-        } for it in items]
-
-        addr = order.shipping_address
-        address_data = None
-        if addr:
-            address_data = {
-                "street": addr.street, "city": addr.city, "state": addr.state, "zip_code": addr.zip_code
-            }
 
-        order_data = {
-            "order_id": order.id,
-            "user": order.user.username,
-            "total_amount": float(order.total_amount),
-            "status": order.status,
-            "created_at": order.created_at,
-            "shipping_address": address_data,
-            "items": items_data,
-        }
-        return Response({"order": order_data}, status=status.HTTP_200_OK)
+class SalesReportView(APIView):
+    def get(self, request):
+        try:
+            report = sales.report(request.query_params)
+        except InvalidFilter:
+            return Response({"error": "Invalid filter value."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"report": report}, status=status.HTTP_200_OK)
 
 
 class Paymentinitiateview(APIView):
@@ -581,6 +737,7 @@ class Paymentinitiateview(APIView):
 
 
 class Paymentconfirmview(APIView):
+    @idempotent("payment_confirm")
     def post(self, request):
         order_id = request.data.get('order_id')
         payment_status = request.data.get('payment_status')
@@ -622,13 +779,12 @@ class AddressCreateView(APIView):
         if not all([user_id, street, city, state, zip_code]):
             return Response({"error": "All fields are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(id=int(user_id))
-        except (User.DoesNotExist, ValueError, TypeError):
+        user = users.by_id(user_id)
+        if user is None:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         address = Address.objects.create(
-            user=user, street=street, city=city, state=state, zip_code=zip_code
+            user_id=user.pk, street=street, city=city, state=state, zip_code=zip_code
         )
         return Response({
             "message": "Address created successfully.",
@@ -677,12 +833,11 @@ class AddressListView(APIView):
         user_id = request.query_params.get('user_id')
         if not user_id:
             return Response({"error": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            user = User.objects.get(id=int(user_id))
-        except (User.DoesNotExist, ValueError, TypeError):
+        user = users.by_id(user_id)
+        if user is None:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        addresses = Address.objects.filter(user=user)
+        addresses = Address.objects.filter(user_id=user.pk)
         data = [{
             "address_id": a.id,
             "street": a.street, "city": a.city, "state": a.state, "zip_code": a.zip_code
@@ -700,16 +855,19 @@ class CouponApplyView(APIView):
         if not all([product_id, coupon_code]):
             return Response({"error": "Product ID and Coupon Code are required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            product = Product.objects.get(id=int(product_id))
-        except (Product.DoesNotExist, ValueError, TypeError):
+            product = catalog_cache.get_product_payload(int(product_id))
+        except (ValueError, TypeError):
+            product = None
+        if product is None:
             return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
+        price = Decimal(str(product["price"]))
         discount_percentage = 10  # demo only
-        discounted_price = product.price * Decimal(1 - discount_percentage / 100)
+        discounted_price = price * Decimal(1 - discount_percentage / 100)
         return Response({
             "message": "Coupon applied successfully.",
-            "product_id": product.id,
-            "original_price": float(product.price),
+            "product_id": product["id"],
+            "original_price": float(price),
             "discounted_price": float(discounted_price)
         }, status=status.HTTP_200_OK)
 
@@ -733,25 +891,84 @@ class CouponRemoveView(APIView):
 # Notifications
 # ─────────────────────────────
 
+def notification_owner(request):
+    """The signed-in user, else the legacy ?user_id=; (user, error response)."""
+    if request.user and request.user.is_authenticated:
+        return request.user, None
+    user_id = request.query_params.get('user_id')
+    if not user_id:
+        return None, Response({"error": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+    user = users.by_id(user_id)
+    if user is None:
+        return None, Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+    return user, None
+
+
 class NotificationListView(APIView):
     def get(self, request):
-        user_id = request.query_params.get('user_id')
-        if not user_id:
-            return Response({"error": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
-        try:
-            user = User.objects.get(id=int(user_id))
-        except (User.DoesNotExist, ValueError, TypeError):
-            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+        user, error = notification_owner(request)
+        if error:
+            return error
+
+        params = request.query_params
+        qs = Notification.objects.filter(user_id=user.pk)
+        try:
+            if parse_bool(params.get("unread")):
+                qs = qs.filter(is_read=False)
+            limit = parse_page_size(params.get("limit"))
+            page, next_cursor = keyset_page(
+                qs.values("id", "message", "is_read", "created_at"), params.get("cursor"), limit
+            )
+        except InvalidFilter:
+            return Response({"error": "Invalid filter value."}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
 
-        notifications = Notification.objects.filter(user=user).order_by('-created_at')
         data = [{
-            "notification_id": n.id,
-            "message": n.message,
-            "is_read": n.is_read,
-            "created_at": n.created_at,
-        } for n in notifications]
-        return Response({"notifications": data}, status=status.HTTP_200_OK)
-    
+            "notification_id": n["id"],
+            "message": n["message"],
+            "is_read": n["is_read"],
+            "created_at": n["created_at"],
+        } for n in page]
+        return Response({"notifications": data, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+
+
+class NotificationUnreadCountView(APIView):
+    def get(self, request):
+        user, error = notification_owner(request)
+        if error:
+            return error
+        return Response({"unread": notifications.unread_count(user.pk)}, status=status.HTTP_200_OK)
+
+
+class NotificationMarkReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ids = request.data.get('notification_ids')
+        try:
+            mark_all = parse_bool(request.data.get('all'))
+        except InvalidFilter:
+            return Response({"error": "Invalid value for all."}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is None and not mark_all:
+            return Response({"error": "Give notification_ids, or all=true."}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is not None:
+            try:
+                if not isinstance(ids, list):
+                    raise TypeError(ids)
+                ids = [int(pk) for pk in ids]
+            except (ValueError, TypeError):
+                return Response({"error": "notification_ids must be a list of ids."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if len(ids) > MAX_PAGE_SIZE:
+                return Response({"error": f"At most {MAX_PAGE_SIZE} ids per request."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        updated = notifications.mark_read(request.user.pk, ids)
+        return Response({"updated": updated, "unread": notifications.unread_count(request.user.pk)},
+                        status=status.HTTP_200_OK)
 
 
 # ─────────────────────────────